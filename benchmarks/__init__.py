@@ -0,0 +1 @@
+# encoding: UTF-8
@@ -0,0 +1,57 @@
+# encoding: UTF-8
+
+"""compare two benchmark results by the median
+
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+
+exit with 1 if any benchmark is slower than the threshold"""
+
+import sys
+import json
+import argparse
+
+
+#----------------------------------------------------------------------
+def load(path: str):
+    with open(path) as result_file:
+        return json.load(result_file)
+
+
+#----------------------------------------------------------------------
+def compare(base: dict, current: dict, threshold: float):
+    """[(name, base median, current median, ratio, regressed)] of the
+    benchmarks in both"""
+    rows = []
+    for name, timing in current['results'].items():
+        base_timing = base['results'].get(name)
+        if base_timing is None:
+            continue
+        ratio = timing['median'] / base_timing['median']
+        rows.append((name, base_timing['median'], timing['median'], ratio,
+                     ratio > 1 + threshold))
+    return rows
+
+
+#----------------------------------------------------------------------
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('base')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type = float, default = 0.1,
+                        help = 'the slowdown ratio counted as regression')
+    args = parser.parse_args(argv)
+
+    base, current = load(args.base), load(args.current)
+    for key in ('days', 'products'):
+        if base['meta'].get(key) != current['meta'].get(key):
+            print(f'warning: {key} differs, {base["meta"].get(key)} vs {current["meta"].get(key)}')
+    print(f'{"benchmark":28s} {base["meta"]["commit"]:>12s} {current["meta"]["commit"]:>12s}   ratio')
+    rows = compare(base, current, args.threshold)
+    for name, base_median, median, ratio, regressed in rows:
+        print(f'{name:28s} {base_median * 1000:9.3f} ms {median * 1000:9.3f} ms'
+              f' {ratio:7.2f}{"  slower" if regressed else ""}')
+    return 1 if any(row[-1] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+# encoding: UTF-8
+
+"""profile the import of the server by python -X importtime
+
+    python -m benchmarks.importtime
+
+the time to import, the peak memory and the slowest imports are written to
+benchmarks/results/<commit>-importtime.json with the raw profile beside,
+the data managers are needed only if the server imports them eagerly"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+from benchmarks.run import ROOT, RESULTS_PATH, get_commit
+
+# the code run in the profiled interpreter
+IMPORT_CODE = '''
+import time, resource
+start = time.perf_counter()
+import server
+seconds = time.perf_counter() - start
+print(seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+'''
+
+
+#----------------------------------------------------------------------
+def profile(data_path: str):
+    """(seconds, max rss KB, importtime lines) of importing the server"""
+    os.makedirs(os.path.join(data_path, 'data'), exist_ok = True)
+    with open(os.path.join(data_path, 'data', 'data.ini'), 'w') as ini_file:
+        ini_file.write('[data]\n'
+                       f'options_monitor = {data_path}\n'
+                       f'cboe_vix_gvz_ovx_monitor = {data_path}\n')
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.join(ROOT, 'pyecharts_flask_kline')] +
+        [path for path in [env.get('PYTHONPATH')] if path])
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', IMPORT_CODE],
+                             cwd = data_path, env = env, capture_output = True,
+                             text = True, check = True)
+    seconds, max_rss = process.stdout.split()
+    lines = [line for line in process.stderr.splitlines() if line.startswith('import time:')]
+    return float(seconds), int(max_rss), lines
+
+
+#----------------------------------------------------------------------
+def parse(lines: list):
+    """[(cumulative us, self us, module)] of the importtime lines"""
+    modules = []
+    for line in lines[1:]:
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return modules
+
+
+#----------------------------------------------------------------------
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--repeat', type = int, default = 5, help = 'the imports timed')
+    parser.add_argument('--top', type = int, default = 20, help = 'the slowest imports kept')
+    parser.add_argument('--output', help = 'the path without the .json/.txt suffix, '
+                        'under benchmarks/results if not set')
+    args = parser.parse_args(argv)
+
+    runs = [profile(tempfile.mkdtemp(prefix = 'vix_web_viewer_import.'))
+            for i in range(args.repeat)]
+    seconds = sorted(run[0] for run in runs)
+    lines = runs[-1][2]
+    modules = parse(lines)
+    # the top level imports of the server
+    top = sorted(((name.strip(), cumulative) for cumulative, self_us, name in modules
+                  if name.startswith('   ') and not name.startswith('    ')),
+                 key = lambda item: -item[1])
+    result = {'meta': {'commit': get_commit(),
+                       'python': sys.version.split()[0],
+                       'repeat': args.repeat},
+              'import_seconds': seconds[len(seconds) // 2],
+              'max_rss_kb': max(run[1] for run in runs),
+              'modules': len(modules),
+              'server_imports_us': dict(top[:args.top])}
+    output = args.output
+    if output is None:
+        output = os.path.join(RESULTS_PATH, f'{get_commit()}-importtime')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok = True)
+    with open(output + '.json', 'w') as result_file:
+        json.dump(result, result_file, indent = 2)
+    with open(output + '.txt', 'w') as raw_file:
+        raw_file.write('\n'.join(lines) + '\n')
+    print(f'import server: {result["import_seconds"] * 1000:.1f} ms, '
+          f'max rss {result["max_rss_kb"]} KB, {result["modules"]} modules')
+    for name, cumulative in top[:args.top]:
+        print(f'{name:32s} {cumulative / 1000:9.1f} ms')
+    print(f'written to {output}.json')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+# encoding: UTF-8
+
+"""time the handlers and the http round trips on the synthetic data
+
+    python -m benchmarks.run --days 1500 --products 10 --repeat 20
+
+the results are written as a json baseline to compare between commits
+with benchmarks.compare"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+from benchmarks import synthetic
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_PATH = os.path.join(ROOT, 'benchmarks', 'results')
+
+
+#----------------------------------------------------------------------
+def get_commit():
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'], cwd = ROOT,
+                                       stderr = subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+#----------------------------------------------------------------------
+def measure(func, repeat: int, setup = None):
+    """the seconds of each call of func after a warm up call, setup() is
+    called before each call and not timed"""
+    if setup is not None:
+        setup()
+    func()
+    timings = []
+    for i in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {'repeat': repeat,
+            'min': min(timings),
+            'median': statistics.median(timings),
+            'mean': statistics.mean(timings),
+            'max': max(timings)}
+
+
+#----------------------------------------------------------------------
+def setup_server(data_path: str):
+    """import the server with the data.ini of the temp dir, the snapshots
+    on disk are disabled, the cboe managers run in threads"""
+    os.makedirs(os.path.join(data_path, 'data'))
+    with open(os.path.join(data_path, 'data', 'data.ini'), 'w') as ini_file:
+        ini_file.write('[data]\n'
+                       f'options_monitor = {data_path}\n'
+                       f'cboe_vix_gvz_ovx_monitor = {data_path}\n'
+                       '[server]\n'
+                       'cache_path =\n'
+                       'cboe_pool = thread\n')
+    os.chdir(data_path)
+    sys.path.insert(0, os.path.join(ROOT, 'pyecharts_flask_kline'))
+    import server
+    return server
+
+
+#----------------------------------------------------------------------
+def run(days: int, products: int, repeat: int, seed: int = 0):
+    """{benchmark: timings}"""
+    synthetic.install(days, products, seed)
+    server = setup_server(tempfile.mkdtemp(prefix = 'vix_web_viewer_bench.'))
+    server.load_handlers()
+    import options_handlers
+    import cboe_handlers
+    from response_cache import response_cache
+
+    app = server.app
+    client = app.test_client()
+    product = next(iter(options_handlers.FUTURE_HV_NAMES_REVERSE))
+    now = options_handlers.get_now_date_str()
+    last_day = cboe_handlers.get_last_day()
+    since = options_handlers.get_iv_data(product, now).index[-6]
+    compared = ','.join(list(options_handlers.FUTURE_HV_NAMES_REVERSE)[:3])
+
+    results = {}
+    results['prepare_siv_info'] = measure(lambda: options_handlers.prepare_siv_info(now),
+                                          max(1, repeat // 5))
+    results['prepare_vix_info'] = measure(lambda: cboe_handlers.prepare_vix_info(last_day),
+                                          max(1, repeat // 5))
+
+    view = options_handlers.get_iv_view(product, now)
+    info = cboe_handlers.get_vix_info(last_day)
+    results['get_iv_data'] = measure(lambda: options_handlers.get_iv_data(product, now), repeat)
+    results['kline_chart'] = measure(
+        lambda: options_handlers.kline_chart(view.data, product, view.marks, view.derived), repeat)
+    results['kline_chart_dump'] = measure(
+        lambda: options_handlers.kline_chart(view.data, product, view.marks,
+                                             view.derived).dump_options_with_quotes(), repeat)
+    results['get_warning_areas'] = measure(lambda: cboe_handlers.get_warning_areas(info.df), repeat)
+    results['line'] = measure(
+        lambda: cboe_handlers.line(info.delivery_dates, info.df, info.derived,
+                                   info.warning_areas), repeat)
+    results['line_dump'] = measure(
+        lambda: cboe_handlers.line(info.delivery_dates, info.df, info.derived,
+                                   info.warning_areas).dump_options_with_quotes(), repeat)
+
+    # the round trips, cold renders the response each time
+    urls = {'siv': f'/siv/{product}/{now}',
+            'siv_points': f'/siv/{product}/{now}?points=500',
+            'siv_f32': f'/siv/{product}/{now}?format=f32',
+            'siv_delta': f'/siv/{product}/data?since={since}',
+            'siv_overview': '/siv/overview/data',
+            'siv_compare': f'/siv/compare/data?products={compared}',
+            'vix': '/vix/data',
+            'vix_points': '/vix/data?points=500',
+            'vix_f32': '/vix/data?format=f32',
+            'siv_page': f'/{product}/{now}',
+            'vix_page': '/vix'}
+    for name, url in urls.items():
+        def get(url = url):
+            response = client.get(url, headers = {'Accept-Encoding': 'gzip'})
+            assert response.status_code == 200, (url, response.status_code)
+        results[f'http_{name}_cold'] = measure(get, repeat, setup = response_cache.invalidate)
+    for name in ('siv', 'vix'):
+        url = urls[name]
+        results[f'http_{name}_warm'] = measure(
+            lambda: client.get(url, headers = {'Accept-Encoding': 'gzip'}), repeat)
+    return results
+
+
+#----------------------------------------------------------------------
+def get_meta(args):
+    import numpy
+    import pandas
+    import pyecharts
+    from importlib.metadata import version
+    return {'commit': get_commit(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': numpy.__version__,
+            'pandas': pandas.__version__,
+            'pyecharts': pyecharts.__version__,
+            'flask': version('flask'),
+            'days': args.days,
+            'products': args.products,
+            'repeat': args.repeat,
+            'seed': args.seed}
+
+
+#----------------------------------------------------------------------
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--days', type = int, default = 1500, help = 'the history length')
+    parser.add_argument('--products', type = int, default = 10, help = 'the product count')
+    parser.add_argument('--repeat', type = int, default = 20, help = 'the timed calls of each')
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--output', help = 'the json file, under benchmarks/results if not set')
+    args = parser.parse_args(argv)
+
+    output = args.output
+    if output is None:
+        output = os.path.join(RESULTS_PATH, f'{get_commit()}-{args.days}x{args.products}.json')
+    output = os.path.abspath(output)
+    results = run(args.days, args.products, args.repeat, args.seed)
+    os.makedirs(os.path.dirname(output), exist_ok = True)
+    with open(output, 'w') as result_file:
+        json.dump({'meta': get_meta(args), 'results': results}, result_file, indent = 2)
+    for name, timing in results.items():
+        print(f'{name:28s} {timing["median"] * 1000:10.3f} ms')
+    print(f'written to {output}')
+
+
+if __name__ == '__main__':
+    main()
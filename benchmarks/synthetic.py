@@ -0,0 +1,213 @@
+# encoding: UTF-8
+
+"""synthetic stand-ins of options_monitor and cboe_monitor, the frames have
+the same columns as SIVManager.prepare and the vix/gvz/ovx data managers,
+generated from a fixed seed so the runs are reproducible"""
+
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+
+
+# the names of the products, p<N> after these
+PRODUCT_NAMES = ['au', 'ag', 'cu', 'al', 'zn', 'ru', 'rb', 'i', 'm', 'rm',
+                 'c', 'sr', 'cf', 'ta', 'ma', 'pp', 'l', 'v', 'pg', 'sc']
+# the last date of the history
+LAST_DATE = '20201231'
+# the trading days between the deliveries of the vix futures
+DELIVERY_PERIOD = 21
+
+# the names of the options_monitor.data_ref columns and states
+DATA_REF = {
+    'PRODUCT_GROUP_NAME': 'product_group',
+    'IV_NAME': 'siv',
+    'IV_C_NAME': 'siv_c',
+    'IV_P_NAME': 'siv_p',
+    'IV_T_NAME': 'siv_t',
+    'IV_PER': 'siv_per',
+    'TURNOVER_PER': 'turnover_per',
+    'OPEN_INTEREST_NAME': 'open_interest',
+    'HV_20_NAME': 'hv20',
+    'HV_250_NAME': 'hv250',
+    'CLOSE_PRICE_NAME': 'close',
+    'VOLUME_NAME': 'volume',
+    'TURNOVER_NAME': 'turnover',
+    'STATE_NAME': 'state',
+    'VOL_STATE_NAME': 'vol_state',
+    'STATE_IN_GAME_UP': 1,
+    'STATE_IN_GAME_DOWN': -1,
+    'STATE_KEEP_WATCHING_UP': 2,
+    'STATE_KEEP_WATCHING_DOWN': -2,
+}
+
+
+#----------------------------------------------------------------------
+def get_dates(days: int):
+    """the business days ending at LAST_DATE as %Y%m%d"""
+    return pd.bdate_range(end = LAST_DATE, periods = days).strftime('%Y%m%d')
+
+
+#----------------------------------------------------------------------
+def get_products(count: int):
+    """{product: product group} of count products"""
+    names = PRODUCT_NAMES[:count] + [f'p{i}' for i in range(len(PRODUCT_NAMES), count)]
+    return {name: name.upper() for name in names}
+
+
+#----------------------------------------------------------------------
+def random_walk(rng, days: int, start: float, scale: float):
+    return start * np.exp(np.cumsum(rng.normal(0, scale, days)))
+
+
+#----------------------------------------------------------------------
+def mean_reverting(rng, days: int, mean: float, scale: float, speed: float = 0.05):
+    values = np.empty(days)
+    value = mean
+    for i, noise in enumerate(rng.normal(0, scale, days)):
+        value += speed * (mean - value) + noise
+        values[i] = value
+    return np.abs(values)
+
+
+#----------------------------------------------------------------------
+def siv_frame(group: str, days: int, seed: int):
+    """the prepared frame of a product like SIVManager.prepare"""
+    ref = DATA_REF
+    rng = np.random.default_rng(seed)
+    dates = get_dates(days)
+    close = random_walk(rng, days, 100 * (1 + seed % 7), 0.012)
+    iv = mean_reverting(rng, days, 0.22, 0.008)
+    iv_c = iv * rng.uniform(0.95, 1.05, days)
+    iv_p = iv * rng.uniform(0.95, 1.05, days)
+    log_ret = pd.Series(np.log(close)).diff()
+    turnover = rng.lognormal(10, 0.6, days)
+    # the states happen at a few percent of the days
+    state = rng.choice([np.nan, ref['STATE_IN_GAME_UP'], ref['STATE_IN_GAME_DOWN'],
+                        ref['STATE_KEEP_WATCHING_UP'], ref['STATE_KEEP_WATCHING_DOWN']],
+                       days, p = [0.92, 0.02, 0.02, 0.02, 0.02])
+    df = pd.DataFrame({
+        ref['CLOSE_PRICE_NAME']: close,
+        ref['IV_NAME']: iv,
+        ref['IV_C_NAME']: iv_c,
+        ref['IV_P_NAME']: iv_p,
+        ref['IV_T_NAME']: (iv_c + iv_p) / 2,
+        ref['IV_PER']: pd.Series(iv).rolling(250, min_periods = 1).rank(pct = True).to_numpy() * 100,
+        ref['TURNOVER_PER']: pd.Series(turnover).rolling(250, min_periods = 1).rank(pct = True).to_numpy() * 100,
+        ref['HV_20_NAME']: (log_ret.rolling(20).std() * np.sqrt(250)).to_numpy(),
+        ref['HV_250_NAME']: (log_ret.rolling(250).std() * np.sqrt(250)).to_numpy(),
+        ref['OPEN_INTEREST_NAME']: rng.lognormal(9, 0.4, days),
+        ref['VOLUME_NAME']: rng.lognormal(8, 0.5, days),
+        ref['TURNOVER_NAME']: turnover,
+        ref['STATE_NAME']: state,
+        ref['VOL_STATE_NAME']: rng.random(days) < 0.03,
+    }, index = pd.Index(dates, name = 'date'))
+    df[ref['PRODUCT_GROUP_NAME']] = group
+    return df
+
+
+#----------------------------------------------------------------------
+def vix_frames(days: int, seed: int):
+    """(term structure, vix_diff, gvz, ovx) like the cboe data managers"""
+    rng = np.random.default_rng(seed)
+    dates = pd.Index(get_dates(days), name = 'date')
+    vix = mean_reverting(rng, days, 18, 1.2, 0.08)
+    # the futures of the next 5 months, contango by default
+    term = pd.DataFrame({i: vix * (1 + 0.03 * i) + rng.normal(0, 0.3, days)
+                         for i in range(6)}, index = dates)
+    term[0] = vix
+    vix_diff = pd.DataFrame({1: (term[2] - term[1]) / term[1]}, index = dates)
+    gvz = pd.DataFrame({'close': mean_reverting(rng, days, 16, 0.8)}, index = dates)
+    ovx = pd.DataFrame({'close': mean_reverting(rng, days, 35, 2.0)}, index = dates)
+    return term, vix_diff, gvz, ovx
+
+
+#----------------------------------------------------------------------
+def make_options_monitor(days: int, products: int, seed: int):
+    """the modules of options_monitor"""
+    data_ref = types.ModuleType('options_monitor.data_ref')
+    data_ref.__dict__.update(DATA_REF)
+    data_ref.FUTURE_HV_NAMES_REVERSE = get_products(products)
+    data_ref.set_data_root = lambda path: None
+
+    data_manager = types.ModuleType('options_monitor.data_manager')
+    # generated once, prepare returns copies like the loads from the disk
+    frames = [siv_frame(group, days, seed + i) for i, group in
+              enumerate(data_ref.FUTURE_HV_NAMES_REVERSE.values())]
+
+    class SIVManager(object):
+        def prepare(self, *args):
+            return [df.copy() for df in frames]
+
+    data_manager.SIVManager = SIVManager
+
+    calendar = types.ModuleType('options_monitor.utilities_calendar')
+    trade_dates = get_dates(days).tolist()
+    calendar.get_last_trade_dates = lambda: list(trade_dates)
+
+    package = types.ModuleType('options_monitor')
+    package.__path__ = []
+    package.data_ref, package.data_manager, package.utilities_calendar = \
+        data_ref, data_manager, calendar
+    return {'options_monitor': package,
+            'options_monitor.data_ref': data_ref,
+            'options_monitor.data_manager': data_manager,
+            'options_monitor.utilities_calendar': calendar}
+
+
+#----------------------------------------------------------------------
+def make_cboe_monitor(days: int, seed: int):
+    """the modules of cboe_monitor"""
+    term, vix_diff, gvz, ovx = vix_frames(days, seed)
+
+    utilities = types.ModuleType('cboe_monitor.utilities')
+    utilities.CLOSE_PRICE_NAME = 'close'
+    utilities.get_last_day = lambda: term.index[-1]
+    utilities.set_data_root = lambda path: None
+    utilities.run_over_time_frame = lambda: (term.index[::DELIVERY_PERIOD].tolist(), None)
+
+    data_manager = types.ModuleType('cboe_monitor.data_manager')
+
+    class VIXDataManager(object):
+        def __init__(self, delivery_dates):
+            self.delivery_dates = delivery_dates
+
+        def combine_all(self, count):
+            return term.copy()
+
+        def analyze(self):
+            return {'vix_diff': vix_diff.copy()}
+
+    class GVZDataManager(object):
+        def __init__(self, delivery_dates):
+            pass
+
+        def analyze(self):
+            return {'gvz': gvz.copy()}
+
+    class OVXDataManager(object):
+        def __init__(self, delivery_dates):
+            pass
+
+        def analyze(self):
+            return {'ovx': ovx.copy()}
+
+    data_manager.VIXDataManager = VIXDataManager
+    data_manager.GVZDataManager = GVZDataManager
+    data_manager.OVXDataManager = OVXDataManager
+
+    package = types.ModuleType('cboe_monitor')
+    package.__path__ = []
+    package.utilities, package.data_manager = utilities, data_manager
+    return {'cboe_monitor': package,
+            'cboe_monitor.utilities': utilities,
+            'cboe_monitor.data_manager': data_manager}
+
+
+#----------------------------------------------------------------------
+def install(days: int = 1500, products: int = 10, seed: int = 0):
+    """replace options_monitor and cboe_monitor in sys.modules by the
+    stand-ins, must be called before the handlers are imported"""
+    sys.modules.update(make_options_monitor(days, products, seed))
+    sys.modules.update(make_cboe_monitor(days, seed))
@@ -0,0 +1,116 @@
+# encoding: UTF-8
+
+"""the scripts of the pages, served from templates/assets with the content
+hash in the url, so they are cached by the browsers until changed.
+
+the libraries are vendored at the pinned versions, fetched again and
+checked against their digests by
+
+    python ./pyecharts_flask_kline/assets.py
+
+the pages load them from the cdn if missing"""
+
+import os
+import sys
+import hashlib
+import logging
+import threading
+import mimetypes
+import urllib.request
+
+from response_cache import CachedBody
+
+ASSETS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'assets')
+# the vendored libraries, where they are fetched and their sha256
+VENDORED = {
+    'jquery.min.js': ('https://code.jquery.com/jquery-3.7.1.min.js',
+                      'fc9a93dd241f6b045cbff0481cf4e1901becd0e12fb45166a8f17f95823f0b1a'),
+    'echarts.min.js': ('https://cdn.jsdelivr.net/npm/echarts@5.6.0/dist/echarts.min.js',
+                       'bf4a223524e40b77c304bec67e1222cf551f14880cf42c69dc046558e11c07b1'),
+}
+# the url never changes its content
+IMMUTABLE = 'public, max-age=31536000, immutable'
+HASH_LENGTH = 12
+
+logger = logging.getLogger(__name__)
+
+# {name: hashed name} and {hashed name: CachedBody}, loaded once
+_urls = None
+_bodies = None
+_lock = threading.Lock()
+
+
+#----------------------------------------------------------------------
+def get_hashed_name(name: str, digest: str):
+    """echarts.min.js to echarts.min.<hash>.js"""
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{digest[:HASH_LENGTH]}{ext}'
+
+
+#----------------------------------------------------------------------
+def load():
+    """hash and precompress the assets, before the workers are forked
+    under gunicorn"""
+    global _urls, _bodies
+    if _urls is not None:
+        return
+    with _lock:
+        if _urls is not None:
+            return
+        urls, bodies = {}, {}
+        for name in sorted(os.listdir(ASSETS_PATH)):
+            path = os.path.join(ASSETS_PATH, name)
+            if not os.path.isfile(path):
+                continue
+            with open(path, 'rb') as asset_file:
+                body = CachedBody(asset_file.read(),
+                                  mimetypes.guess_type(name)[0] or 'application/octet-stream')
+            hashed_name = get_hashed_name(name, body.digest)
+            urls[name] = f'/assets/{hashed_name}'
+            bodies[hashed_name] = body
+        _bodies = bodies
+        _urls = urls
+    for name in sorted(set(VENDORED) - set(urls)):
+        logger.warning('%s is not vendored in %s, the pages load it from %s, '
+                       'run python ./pyecharts_flask_kline/assets.py to vendor it.',
+                       name, ASSETS_PATH, VENDORED[name][0])
+
+
+#----------------------------------------------------------------------
+def url(name: str):
+    """the hashed url of the asset, the cdn if not vendored yet"""
+    load()
+    if name in _urls:
+        return _urls[name]
+    return VENDORED[name][0]
+
+
+#----------------------------------------------------------------------
+def respond(hashed_name: str):
+    """the response of the asset, None if not found"""
+    load()
+    body = _bodies.get(hashed_name)
+    if body is None:
+        return None
+    response = body.make_response()
+    response.headers['Cache-Control'] = IMMUTABLE
+    return response
+
+
+#----------------------------------------------------------------------
+def fetch(names = None):
+    """download the vendored libraries into the assets, a body not matching
+    the pinned digest is not written"""
+    for name in names or VENDORED:
+        url, digest = VENDORED[name]
+        with urllib.request.urlopen(url, timeout = 60) as remote:
+            body = remote.read()
+        if hashlib.sha256(body).hexdigest() != digest:
+            raise ValueError(f'{name} from {url} does not match its sha256 {digest}')
+        with open(os.path.join(ASSETS_PATH, name), 'wb') as asset_file:
+            asset_file.write(body)
+        print(f'{name}: {len(body)} bytes from {url}')
+
+
+if __name__ == '__main__':
+    fetch(sys.argv[1:])
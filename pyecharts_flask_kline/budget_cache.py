@@ -0,0 +1,175 @@
+# encoding: UTF-8
+
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+# the default of get for a missing key
+MISSING = object()
+
+
+#----------------------------------------------------------------------
+def frame_memory_usage(df):
+    """memory_usage(deep = True) of the frame, including the read-only
+    object columns of the frozen frames, which pandas fails to measure"""
+    try:
+        return int(df.memory_usage(deep = True).sum())
+    except ValueError:
+        total = int(df.memory_usage(deep = False).sum())
+        for values in [df.index.to_numpy()] + [df.iloc[:, i].to_numpy()
+                                                for i in range(df.shape[1])]:
+            if values.dtype == object:
+                total += sum(map(sys.getsizeof, values))
+        return total
+
+
+#----------------------------------------------------------------------
+def sizeof(value):
+    """the bytes of the value, frames measured by memory_usage(deep = True)"""
+    # not imported with the server, loaded with the handlers
+    import pandas as pd
+    if isinstance(value, pd.DataFrame):
+        return frame_memory_usage(value)
+    if hasattr(value, 'memory_usage'):
+        return int(value.memory_usage())
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(sizeof(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(sizeof(item) for item in value)
+    return sys.getsizeof(value)
+
+
+#----------------------------------------------------------------------
+class BudgetCache(object):
+    """a lru cache limited by the bytes of the values, not the count.
+
+    the entries older than ttl seconds (if set) are dropped on access, the
+    least recently used are evicted once the budget is exceeded, the newest
+    entry is always kept even if it is larger than the budget. the pinned
+    keys are never evicted nor expired, only invalidated."""
+
+    #----------------------------------------------------------------------
+    def __init__(self, name: str, max_bytes: int, ttl: float = None):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # key -> (value, size, created)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._pinned = set()
+        self._listeners = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    #----------------------------------------------------------------------
+    def add_listener(self, func):
+        """func(key, value, reason) is called after an entry is dropped,
+        reason in 'evicted', 'expired' and 'invalidated'"""
+        self._listeners.append(func)
+
+    #----------------------------------------------------------------------
+    def pin(self, key):
+        """keep the entry of key (stored or not yet) until unpinned"""
+        with self._lock:
+            self._pinned.add(key)
+
+    #----------------------------------------------------------------------
+    def unpin(self, key):
+        with self._lock:
+            self._pinned.discard(key)
+
+    #----------------------------------------------------------------------
+    def get(self, key, default = MISSING, count: bool = True):
+        """the value of key, count the hit/miss if count is set"""
+        dropped = []
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(key, entry):
+                dropped.append(self._pop(key, 'expired'))
+                entry = None
+            if entry is None:
+                if count:
+                    self.misses += 1
+                value = default
+            else:
+                if count:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                value = entry[0]
+        self._notify(dropped)
+        return value
+
+    #----------------------------------------------------------------------
+    def put(self, key, value, size: int = None):
+        """store the value, evict the lru entries out of the budget"""
+        if size is None:
+            size = sizeof(value)
+        dropped = []
+        with self._lock:
+            if key in self._entries:
+                self._pop(key, None)
+            self._entries[key] = (value, size, time.monotonic())
+            self._bytes += size
+            if self._bytes > self.max_bytes:
+                # the lru first, but never the pinned nor the newest
+                for old in [old for old in self._entries
+                            if old not in self._pinned and old != key]:
+                    dropped.append(self._pop(old, 'evicted'))
+                    if self._bytes <= self.max_bytes:
+                        break
+        self._notify(dropped)
+
+    #----------------------------------------------------------------------
+    def invalidate(self, match = None):
+        """drop the entries whose key match(key) is true, all if None"""
+        dropped = []
+        with self._lock:
+            for key in [key for key in self._entries if match is None or match(key)]:
+                dropped.append(self._pop(key, 'invalidated'))
+                self._pinned.discard(key)
+        self._notify(dropped)
+
+    #----------------------------------------------------------------------
+    def stats(self):
+        """the counters and the usage of the cache"""
+        with self._lock:
+            return {'entries': len(self._entries),
+                    'bytes': self._bytes,
+                    'max_bytes': self.max_bytes,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'pinned': len(self._pinned),
+                    'evictions': self.evictions,
+                    'expirations': self.expirations,
+                    'invalidations': self.invalidations}
+
+    #----------------------------------------------------------------------
+    def _expired(self, key, entry):
+        return self.ttl is not None and key not in self._pinned and \
+            time.monotonic() - entry[2] > self.ttl
+
+    #----------------------------------------------------------------------
+    def _pop(self, key, reason: str):
+        """must be called with the lock held"""
+        value, size, created = self._entries.pop(key)
+        self._bytes -= size
+        if reason == 'evicted':
+            self.evictions += 1
+        elif reason == 'expired':
+            self.expirations += 1
+        elif reason == 'invalidated':
+            self.invalidations += 1
+        return key, value, reason
+
+    #----------------------------------------------------------------------
+    def _notify(self, dropped: list):
+        for key, value, reason in dropped:
+            for func in self._listeners:
+                func(key, value, reason)
@@ -1,72 +1,265 @@
 # encoding: UTF-8
 
 from flask import render_template
-from functools import lru_cache
 
 from pyecharts import options as opts
 from pyecharts.charts import Line, Bar, Grid
 from flask import render_template
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import numpy as np
+import pandas as pd
 
 from cboe_monitor.data_manager import VIXDataManager, GVZDataManager, OVXDataManager
 from cboe_monitor.utilities import run_over_time_frame, CLOSE_PRICE_NAME, get_last_day
 
+from refresher import DataSnapshot, register
+from budget_cache import sizeof
+from frozen import freeze_frame
+import disk_cache
+from downsample import window_slice, sample_positions, get_extremes, minmax_lines
+from delta import dump_delta
+from transport import dump_dataset
+import metrics
+from metrics import span
+
+
+# the decimals of the series in the dataset transport
+DATASET_PRECISION = {'delivery': 0}
+
+
+# the pool running the data managers concurrently, 'thread' or 'process'
+ANALYZE_POOL = 'thread'
+ANALYZE_WORKERS = 3
+# seconds spent by each data manager in the last prepare
+ANALYZE_TIMINGS = {}
+
+# the column and the (enter, exit) thresholds of the warning areas of each
+# index, enter < exit: warn from the value < enter until it is >= exit,
+# enter > exit: warn from the value > enter until it is <= exit
+WARNING_COLUMNS = {'vix': 'diff', 'gvz': 'gvz', 'ovx': 'ovx'}
+WARNING_THRESHOLDS = {'vix': (-0.005, 0.02)}
+# the colors of the areas besides the vix ones
+WARNING_COLORS = {'gvz': '#80800018', 'ovx': '#D2B48C18'}
+
 
 #----------------------------------------------------------------------
-@lru_cache
-def get_vix_info(last_date):
-    # query data from the data manager
-    # param last_date is for lru_cache only
-    delivery_dates, schedule_days = run_over_time_frame()
+def set_analyze_pool(pool: str, workers: int):
+    """set the kind and the size of the pool of the data managers"""
+    global ANALYZE_POOL, ANALYZE_WORKERS
+    ANALYZE_POOL = pool
+    ANALYZE_WORKERS = workers
+
+
+#----------------------------------------------------------------------
+def set_warning_thresholds(thresholds: dict):
+    """set the (enter, exit) thresholds by index name, None to disable"""
+    for name, threshold in thresholds.items():
+        if threshold is None:
+            WARNING_THRESHOLDS.pop(name, None)
+        else:
+            WARNING_THRESHOLDS[name] = threshold
+
+
+#----------------------------------------------------------------------
+def analyze_vix(delivery_dates):
+    """the vix term structure with the diff of the first month"""
     vdm = VIXDataManager(delivery_dates)
     df = vdm.combine_all(24)
     rets_vix = vdm.analyze()
-    gvzm = GVZDataManager([])
-    rets_gvzm = gvzm.analyze()
-    ovxm = OVXDataManager([])
-    rets_ovxm = ovxm.analyze()
-    vix_diff = rets_vix['vix_diff'][[1]]
-    vix_diff.rename({1 : 'diff'}, axis = 1, inplace = True)
-    df_gvz = rets_gvzm['gvz'][[CLOSE_PRICE_NAME]]
-    df_gvz.rename({CLOSE_PRICE_NAME : 'gvz'}, axis = 1, inplace = True)
-    df_ovx = rets_ovxm['ovx'][[CLOSE_PRICE_NAME]]
-    df_ovx.rename({CLOSE_PRICE_NAME : 'ovx'}, axis = 1, inplace = True)
-    df = df.join(vix_diff)
-    df = df.join(df_gvz)
-    df = df.join(df_ovx)
-    return df, delivery_dates
-
-
-#----------------------------------------------------------------------
-def get_warning_areas(df):
-    """get the warning based on vix_diff"""
-    warning = False
-    areas = []
-    start = None
-    for date, diff in zip(df.index, df['diff']):
-        if warning is False and diff < -0.005:
-            warning = True
-            start = date
-        elif warning is True and diff >= 0.02:
-            warning = False
-            areas.append((start, date))
-            start = None
-    # close the last area
-    if start is not None:
-        last_date = df.index[-1]
-        if start == last_date:
-            # move the last date to the previous
-            start = df.index[-2]
-        areas.append((start, last_date))
-    return areas
-
-
-#----------------------------------------------------------------------
-def line(delivery_dates, df):
+    vix_diff = rets_vix['vix_diff'][[1]].rename({1 : 'diff'}, axis = 1)
+    return df, vix_diff
+
+
+#----------------------------------------------------------------------
+def analyze_gvz():
+    rets_gvzm = GVZDataManager([]).analyze()
+    return rets_gvzm['gvz'][[CLOSE_PRICE_NAME]].rename({CLOSE_PRICE_NAME : 'gvz'}, axis = 1)
+
+
+#----------------------------------------------------------------------
+def analyze_ovx():
+    rets_ovxm = OVXDataManager([]).analyze()
+    return rets_ovxm['ovx'][[CLOSE_PRICE_NAME]].rename({CLOSE_PRICE_NAME : 'ovx'}, axis = 1)
+
+
+#----------------------------------------------------------------------
+def timed(func, *args):
+    """(result, seconds) of func(*args), run in the pool"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+#----------------------------------------------------------------------
+def prepare_vix_info(last_date):
+    # query data from the data managers, run concurrently
+    # param last_date is the snapshot key only
+    delivery_dates, schedule_days = run_over_time_frame()
+    tasks = {'vix': (analyze_vix, delivery_dates),
+             'gvz': (analyze_gvz, ),
+             'ovx': (analyze_ovx, )}
+    executor_class = ProcessPoolExecutor if ANALYZE_POOL == 'process' else ThreadPoolExecutor
+    with executor_class(max_workers = ANALYZE_WORKERS) as executor:
+        futures = {name: executor.submit(timed, *task) for name, task in tasks.items()}
+        results = {}
+        for name, future in futures.items():
+            results[name], ANALYZE_TIMINGS[name] = future.result()
+            # observed here, the process pool workers have their own metrics
+            metrics.observe(f'vix_analyze_{name}', ANALYZE_TIMINGS[name])
+    df, vix_diff = results['vix']
+    # align all in one step
+    with span('vix_join'):
+        df = df.join([vix_diff, results['gvz'], results['ovx']])
+    with span('vix_tables'):
+        return VIXInfo.prepare(df, delivery_dates)
+
+
+#----------------------------------------------------------------------
+def build_vix_info(last_date):
+    """load the snapshot on disk, or query and write it for the other
+    worker processes"""
+    return disk_cache.load_or_build('vix', last_date, prepare_vix_info,
+                                    VIXInfo.dump, VIXInfo.restore)
+
+
+#----------------------------------------------------------------------
+def get_derived_frame(df, delivery_dates):
+    """the columns derived from the joined frame: the delivery mark"""
+    return pd.DataFrame({
+        'delivery': 10 + 5 * df.index.isin(delivery_dates)},
+                        index = df.index)
+
+
+#----------------------------------------------------------------------
+def get_series_frame(df, derived):
+    """the y values of the vix chart by series name"""
+    return pd.DataFrame({
+        'vix': df[0],
+        'gvz': df['gvz'],
+        'ovx': df['ovx'],
+        '1': df[1],
+        '2': df[2],
+        '3': df[3],
+        '4': df[4],
+        '5': df[5],
+        'delivery': derived['delivery']}, index = df.index)
+
+
+#----------------------------------------------------------------------
+class VIXInfo(object):
+    """the joined frame with the derived columns and the warning areas,
+    all computed once per refresh and frozen, the handlers only read them"""
+
+    #----------------------------------------------------------------------
+    def __init__(self, df, delivery_dates, derived, warning_areas, index_areas = None):
+        self.delivery_dates = delivery_dates
+        self.derived = freeze_frame(derived)
+        self.warning_areas = warning_areas
+        # the warning areas of gvz and ovx by name, if configured
+        self.index_areas = index_areas or {}
+        self.df = freeze_frame(df)
+
+    #----------------------------------------------------------------------
+    def memory_usage(self):
+        """the bytes of the frames"""
+        return sizeof([self.df, self.derived])
+
+    #----------------------------------------------------------------------
+    @classmethod
+    def prepare(cls, df, delivery_dates):
+        """compute the derived columns and the warning areas"""
+        return cls(df, delivery_dates,
+                   get_derived_frame(df, delivery_dates), get_warning_areas(df),
+                   get_index_areas(df))
+
+    #----------------------------------------------------------------------
+    def dump(self):
+        """the frames and extras to write to the disk snapshot"""
+        return ({'df': self.df, 'derived': self.derived},
+                {'delivery_dates': self.delivery_dates})
+
+    #----------------------------------------------------------------------
+    @classmethod
+    def restore(cls, frames: dict, extras: dict):
+        """the info of the frames loaded from the disk snapshot, the areas
+        are computed again with the thresholds configured now"""
+        df = frames['df']
+        return cls(df, extras['delivery_dates'], frames['derived'],
+                   get_warning_areas(df), get_index_areas(df))
+
+
+vix_snapshot = register(DataSnapshot('vix', build_vix_info, get_last_day))
+
+
+#----------------------------------------------------------------------
+def get_vix_info(last_date):
+    """the vix info of the last day, rebuilt in background when the last
+    day changed"""
+    with span('vix_snapshot'):
+        return vix_snapshot.get(last_date)
+
+
+#----------------------------------------------------------------------
+def hysteresis_runs(values: np.ndarray, enter: float, exit: float):
+    """(starts, ends) positions of the runs entered by values < enter and
+    exited by values >= exit (values > enter and <= exit if enter > exit),
+    nan changes nothing, the last run is ended at the last position"""
+    values = np.asarray(values, dtype = float)
+    if enter > exit:
+        values, enter, exit = -values, -enter, -exit
+    # the state set by the last event, 1 in the run, with the 0 before all
+    events = np.full(len(values) + 1, np.nan)
+    events[0] = 0
+    with np.errstate(invalid = 'ignore'):
+        events[1:][values < enter] = 1
+        events[1:][values >= exit] = 0
+    has_event = ~np.isnan(events)
+    last_event = np.maximum.accumulate(np.where(has_event, np.arange(len(events)), 0))
+    change = np.diff(events[last_event])
+    starts = np.flatnonzero(change > 0)
+    ends = np.flatnonzero(change < 0)
+    if len(ends) < len(starts):
+        ends = np.append(ends, len(values) - 1)
+    return starts, ends
+
+
+#----------------------------------------------------------------------
+def get_warning_areas(df, name: str = 'vix'):
+    """get the warning areas of the index, of vix_diff by default, none if
+    the thresholds of the index are disabled"""
+    if name not in WARNING_THRESHOLDS:
+        return []
+    with span(f'{name}_warning_areas'):
+        enter, exit = WARNING_THRESHOLDS[name]
+        starts, ends = hysteresis_runs(df[WARNING_COLUMNS[name]].to_numpy(), enter, exit)
+        if len(starts) > 0 and starts[-1] == len(df) - 1:
+            # the last area started at the last date, move it to the previous
+            starts[-1] -= 1
+        return list(zip(df.index[starts], df.index[ends]))
+
+
+#----------------------------------------------------------------------
+def get_index_areas(df):
+    """the warning areas of the indexes besides vix by name"""
+    return {name: get_warning_areas(df, name) for name in WARNING_THRESHOLDS
+            if name != 'vix'}
+
+
+#----------------------------------------------------------------------
+def line(delivery_dates, df, derived = None, warning_areas = None, extremes = None,
+         index_areas = None):
     # line the vix
     FLINE_OPT = opts.LineStyleOpts(opacity = 1, width = 1.5)
     OLINE_OPT = opts.LineStyleOpts(opacity = 0.9, width = 1.2, type_ = 'dashed')
-    df['delivery'] = [10 + 5 * (idx in delivery_dates) for idx in df.index]
-    warning_areas = get_warning_areas(df)
+    if derived is None:
+        derived = get_derived_frame(df, delivery_dates)
+    if warning_areas is None:
+        warning_areas = get_warning_areas(df)
+    if index_areas is None:
+        index_areas = get_index_areas(df)
+    if extremes is None:
+        extremes = {}
     # there is a bug in pyecharts, the colors are reversed
     # line.colors = ['crimson', 'gold', 'green', 'fuchsia', 'orchid', 'plum']
     line = (Line()
@@ -76,29 +269,20 @@ def line(delivery_dates, df):
                        linestyle_opts = FLINE_OPT,
                        color = 'powderblue',
                        markline_opts = opts.MarkLineOpts(
-                           data = [
-                               opts.MarkLineItem(type_ = "min", name = "ivl"),
-                               opts.MarkLineItem(type_ = "max", name = "ivh"),
-                           ]))
+                           data = minmax_lines("ivl", "ivh", extremes.get("vix"))))
             .add_yaxis('gvz', df['gvz'],
                        is_symbol_show = False,
                        linestyle_opts = FLINE_OPT,
                        color = 'olive',
                        markline_opts = opts.MarkLineOpts(
-                           data = [
-                               opts.MarkLineItem(type_ = "min", name = "ivl"),
-                               opts.MarkLineItem(type_ = "max", name = "ivh"),
-                           ]
+                           data = minmax_lines("ivl", "ivh", extremes.get("gvz")),
                        ))
             .add_yaxis('ovx', df['ovx'],
                        is_symbol_show = False, linestyle_opts = FLINE_OPT,
                        color = 'tan',
                        # is_selected = False,
                        markline_opts = opts.MarkLineOpts(
-                           data = [
-                               opts.MarkLineItem(type_ = "min", name = "ivl"),
-                               opts.MarkLineItem(type_ = "max", name = "ivh"),
-                           ]))
+                           data = minmax_lines("ivl", "ivh", extremes.get("ovx"))))
             .add_yaxis("1", df[1], is_symbol_show = False, color = 'plum',
                        linestyle_opts = OLINE_OPT)
             .add_yaxis("2", df[2], is_symbol_show = False, color = 'orchid',
@@ -110,7 +294,7 @@ def line(delivery_dates, df):
             .add_yaxis("5", df[5], is_symbol_show = False, color = 'gold',
                        linestyle_opts = OLINE_OPT)
             # add delivery date mark, not a good idea, but worked.
-            .add_yaxis("delivery", df['delivery'], is_symbol_show = False, color = 'crimson', is_step = True)
+            .add_yaxis("delivery", derived['delivery'], is_symbol_show = False, color = 'crimson', is_step = True)
             .set_series_opts(
                 label_opts = opts.LabelOpts(is_show = False),
                 markarea_opts = opts.MarkAreaOpts(
@@ -136,6 +320,14 @@ def line(delivery_dates, df):
                 tooltip_opts = opts.TooltipOpts(trigger = "axis", axis_pointer_type = "line"),
                 datazoom_opts = opts.DataZoomOpts(type_ = "slider", range_start = 50, range_end = 100),
             ))
+    # the areas of gvz and ovx replace the vix ones on their own series
+    for series in line.options['series']:
+        areas = index_areas.get(series['name'])
+        if areas:
+            series['markArea'] = opts.MarkAreaOpts(
+                is_silent = True,
+                data = [opts.MarkAreaItem(name = "warn", x=(xs, xe)) for xs, xe in areas],
+                itemstyle_opts = opts.ItemStyleOpts(color = WARNING_COLORS[series['name']]))
     return line
 
 
@@ -145,8 +337,70 @@ def get_template():
 
 
 #----------------------------------------------------------------------
-def get_data():
+def clip_areas(areas: list, index):
+    """the areas overlapping the index, clipped to its bounds"""
+    if len(index) == 0:
+        return []
+    first, last = index[0], index[-1]
+    return [(max(xs, first), min(xe, last)) for xs, xe in areas
+            if xe >= first and xs <= last]
+
+
+#----------------------------------------------------------------------
+def get_data(points: int = None, start: str = None, end: str = None,
+             transport: str = None, precision: int = None):
     last_day = get_last_day()
-    df, delivery_dates = get_vix_info(last_day)
-    chart = line(delivery_dates, df)
-    return chart.dump_options_with_quotes()
+    info = get_vix_info(last_day)
+    window = window_slice(info.df.index, start, end)
+    df, derived = info.df.iloc[window], info.derived.iloc[window]
+    warning_areas = clip_areas(info.warning_areas, df.index)
+    index_areas = {name: clip_areas(areas, df.index) for name, areas in info.index_areas.items()}
+    extremes = None
+    if points is not None and points < len(df):
+        extremes = {name: get_extremes(df[column]) for name, column in
+                    (('vix', 0), ('gvz', 'gvz'), ('ovx', 'ovx'))}
+        # keep the delivery steps and the bounds of the warning areas, the
+        # rest of the points go to the lines, more only if these are more
+        bounds = [x for areas in [warning_areas] + list(index_areas.values())
+                  for area in areas for x in area]
+        keep = [np.flatnonzero(derived['delivery'].to_numpy() > 10),
+                df.index.get_indexer(bounds)]
+        positions = sample_positions([df[0], df['gvz'], df['ovx']], points,
+                                     keep = np.concatenate(keep))
+        df, derived = df.iloc[positions], derived.iloc[positions]
+    with span('vix_chart'):
+        chart = line(info.delivery_dates, df, derived, warning_areas, extremes, index_areas)
+    with span('vix_dump'):
+        if transport is not None:
+            series = get_series_frame(df, derived)
+            if precision is None:
+                return dump_dataset(chart, series, transport, DATASET_PRECISION)
+            return dump_dataset(chart, series, transport, default_precision = precision)
+        return chart.dump_options_with_quotes()
+
+
+#----------------------------------------------------------------------
+def get_delta(since: str):
+    """the rows from since (sent again) with the warning areas and the full
+    resolution extremes of the mark lines"""
+    info = get_vix_info(get_last_day())
+    series = get_series_frame(info.df, info.derived)
+    marklines = {name: get_extremes(series[name]) for name in ('vix', 'gvz', 'ovx')}
+    # the areas ended from since on are new, extended or moved, they
+    # replace the ones of the clients ended from since on
+    areas = info.warning_areas
+    index_areas = info.index_areas
+    if since:
+        start = series.index.searchsorted(since, side = 'left')
+        # no rows from since on, nothing to replace
+        since_date = series.index[start] if start < len(series) else None
+        def ended(areas):
+            return [area for area in areas
+                    if since_date is not None and area[1] >= since_date]
+        areas = ended(areas)
+        index_areas = {name: ended(index_areas[name]) for name in index_areas}
+    with span('vix_dump'):
+        return dump_delta(series, since,
+                          markareas = areas,
+                          seriesareas = index_areas,
+                          marklines = marklines)
@@ -0,0 +1,23 @@
+# encoding: UTF-8
+
+import pandas as pd
+import simplejson as json
+from pyecharts.charts.base import default
+
+
+#----------------------------------------------------------------------
+def dump_delta(series: pd.DataFrame, since: str, **updates):
+    """the rows of the series frame from since on, for the clients to
+    append to the chart they have. the row at since is sent again and
+    replaced, its derived values may depend on the next row (ivp_warn).
+    the updates (marks, mark lines...) are sent as they are, serialized
+    like the pyecharts options"""
+    start = 0 if not since else series.index.searchsorted(since, side = 'left')
+    rows = series.iloc[start:]
+    payload = {
+        'date': series.index[-1] if len(series) else None,
+        'xaxis': rows.index.tolist(),
+        'series': {name: rows[name].tolist() for name in rows.columns},
+    }
+    payload.update(updates)
+    return json.dumps(payload, default = default, ignore_nan = True)
@@ -0,0 +1,186 @@
+# encoding: UTF-8
+
+import os
+import json
+import time
+import shutil
+import pickle
+import fcntl
+import logging
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from metrics import span
+
+
+logger = logging.getLogger(__name__)
+
+# the root of the on-disk snapshots, disabled if None
+CACHE_ROOT = None
+# the trading days kept for each snapshot
+KEEP_DAYS = 2
+META_FILE = 'meta.json'
+EXTRAS_FILE = 'extras.pkl'
+# the version of the data of each snapshot name, set once the data files
+# changed, the snapshots of an older version of the same key are not loaded
+DATA_VERSIONS = {}
+# seconds between the tries of the build lock
+LOCK_POLL = 0.05
+
+
+#----------------------------------------------------------------------
+def set_cache_root(path: str):
+    """set the root of the on-disk snapshots, None to disable"""
+    global CACHE_ROOT
+    CACHE_ROOT = path
+
+
+#----------------------------------------------------------------------
+def set_data_version(name: str, version: int):
+    DATA_VERSIONS[name] = version
+
+
+#----------------------------------------------------------------------
+def get_versioned_key(name: str, key: str):
+    """the key with the data version, sorted after the older versions"""
+    version = DATA_VERSIONS.get(name)
+    if version is None:
+        return str(key)
+    return f'{key}.{version:020d}'
+
+
+#----------------------------------------------------------------------
+def get_snapshot_path(name: str, key: str):
+    return os.path.join(CACHE_ROOT, name, str(key))
+
+
+#----------------------------------------------------------------------
+@contextmanager
+def build_lock(name: str, key: str):
+    """the lock of the build across the worker processes, only one process
+    builds and writes the snapshot, the others wait and load it"""
+    if CACHE_ROOT is None:
+        yield
+        return
+    os.makedirs(os.path.join(CACHE_ROOT, name), exist_ok = True)
+    with open(get_snapshot_path(name, key) + '.lock', 'w') as lock_file:
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                # a cooperative sleep under gevent, not the whole worker
+                time.sleep(LOCK_POLL)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+#----------------------------------------------------------------------
+def save_frame(path: str, df: pd.DataFrame):
+    """one .npy per column, the numeric columns are memory mapped on load"""
+    os.makedirs(path)
+    np.save(os.path.join(path, 'index.npy'), df.index.to_numpy())
+    for i, column in enumerate(df.columns):
+        np.save(os.path.join(path, f'{i}.npy'), df[column].to_numpy())
+    meta = {'columns': df.columns.tolist(),
+            'index_name': df.index.name}
+    with open(os.path.join(path, META_FILE), 'w') as meta_file:
+        json.dump(meta, meta_file)
+
+
+#----------------------------------------------------------------------
+def load_array(path: str):
+    """memory mapped if possible, the object arrays are loaded"""
+    try:
+        return np.load(path, mmap_mode = 'r')
+    except ValueError:
+        return np.load(path, allow_pickle = True)
+
+
+#----------------------------------------------------------------------
+def load_frame(path: str):
+    """the frame sharing the memory mapped columns, read-only"""
+    with open(os.path.join(path, META_FILE)) as meta_file:
+        meta = json.load(meta_file)
+    index = load_array(os.path.join(path, 'index.npy'))
+    columns = {column: load_array(os.path.join(path, f'{i}.npy'))
+               for i, column in enumerate(meta['columns'])}
+    return pd.DataFrame(columns, columns = meta['columns'],
+                        index = pd.Index(index, name = meta['index_name']),
+                        copy = False)
+
+
+#----------------------------------------------------------------------
+def save(name: str, key: str, frames: dict, extras = None):
+    """write the frames {id: frame} and the picklable extras of the key,
+    atomically, then drop the snapshots older than KEEP_DAYS"""
+    if CACHE_ROOT is None:
+        return
+    path = get_snapshot_path(name, key)
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    tmp_path = tempfile.mkdtemp(prefix = f'.{key}.', dir = os.path.dirname(path))
+    try:
+        for i, df in enumerate(frames.values()):
+            save_frame(os.path.join(tmp_path, str(i)), df)
+        with open(os.path.join(tmp_path, EXTRAS_FILE), 'wb') as extras_file:
+            pickle.dump({'ids': list(frames.keys()), 'extras': extras}, extras_file)
+        os.rename(tmp_path, path)
+    except Exception:
+        logger.exception('save snapshot %s for %s failed.', name, key)
+        shutil.rmtree(tmp_path, ignore_errors = True)
+        return
+    names = sorted(entry for entry in os.listdir(os.path.dirname(path))
+                   if not entry.startswith('.') and not entry.endswith('.lock'))
+    for old in names[:-KEEP_DAYS]:
+        old_path = os.path.join(os.path.dirname(path), old)
+        shutil.rmtree(old_path, ignore_errors = True)
+        if os.path.exists(old_path + '.lock'):
+            os.remove(old_path + '.lock')
+
+
+#----------------------------------------------------------------------
+def load(name: str, key: str):
+    """(frames, extras) of the key, None if not cached"""
+    if CACHE_ROOT is None:
+        return None
+    path = get_snapshot_path(name, key)
+    if not os.path.isdir(path):
+        return None
+    try:
+        with span(f'{name}_load'):
+            with open(os.path.join(path, EXTRAS_FILE), 'rb') as extras_file:
+                stored = pickle.load(extras_file)
+            frames = {frame_id: load_frame(os.path.join(path, str(i)))
+                      for i, frame_id in enumerate(stored['ids'])}
+    except Exception:
+        logger.exception('load snapshot %s for %s failed.', name, key)
+        return None
+    return frames, stored['extras']
+
+
+#----------------------------------------------------------------------
+def load_or_build(name: str, key: str, build, dump, restore):
+    """the value of the key from the disk snapshot, or built by build(key)
+    and written once for all the worker processes.
+
+    dump(value) returns (frames, extras) to write, restore(frames, extras)
+    returns the value"""
+    disk_key = get_versioned_key(name, key)
+    stored = load(name, disk_key)
+    if stored is not None:
+        return restore(*stored)
+    with build_lock(name, disk_key):
+        # built by another process while waiting
+        stored = load(name, disk_key)
+        if stored is not None:
+            return restore(*stored)
+        value = build(key)
+        save(name, disk_key, *dump(value))
+        return value
@@ -0,0 +1,90 @@
+# encoding: UTF-8
+
+import numpy as np
+import pandas as pd
+from pyecharts import options as opts
+
+
+#----------------------------------------------------------------------
+def window_slice(index: pd.Index, start = None, end = None):
+    """the positional slice of the sorted index between start and end,
+    both included, None for the unbounded side"""
+    lo = 0 if start is None else index.searchsorted(start, side = 'left')
+    hi = len(index) if end is None else index.searchsorted(end, side = 'right')
+    return slice(lo, hi)
+
+
+#----------------------------------------------------------------------
+def lttb(y, points: int):
+    """the positions kept by largest-triangle-three-buckets, the x axis is
+    the position (the category axis), nan values are never chosen unless
+    the whole bucket is nan"""
+    y = np.asarray(y, dtype = float)
+    n = len(y)
+    if points >= n or points < 3:
+        return np.arange(n)
+    # the bucket bounds of the points between the first and the last
+    bounds = np.floor(np.linspace(1, n - 1, points - 1)).astype(int)
+    x = np.arange(n, dtype = float)
+    # the averages of the next bucket, the last point for the last bucket
+    sums = np.concatenate(([0.], np.nancumsum(y)))
+    counts = np.concatenate(([0], np.cumsum(~np.isnan(y))))
+    next_lo = bounds[1:]
+    next_hi = np.append(bounds[2:], n)
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        avg_y = (sums[next_hi] - sums[next_lo]) / (counts[next_hi] - counts[next_lo])
+    avg_x = (next_lo + next_hi - 1) / 2.
+    avg_y[-1], avg_x[-1] = y[-1], n - 1
+    kept = np.empty(points, dtype = int)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        # twice the triangle areas of the bucket, vectorized
+        area = np.abs((x[a] - avg_x[i]) * (y[lo:hi] - y[a]) -
+                      (x[a] - x[lo:hi]) * (avg_y[i] - y[a]))
+        if np.isnan(area).all():
+            a = lo
+        else:
+            a = lo + int(np.nanargmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+#----------------------------------------------------------------------
+def sample_positions(columns: list, points: int, keep = None):
+    """the sorted positions kept for all the columns, at most points in
+    total: the positions in keep first, the rest of the budget shared by the
+    lttb of the columns, the first column takes it all if the shares are
+    less than 3 points. more than points are returned only if keep has more
+    already, then keep and the first and the last positions are returned"""
+    n = len(columns[0])
+    keep = np.unique(np.asarray([] if keep is None else keep, dtype = int))
+    budget = points - len(keep)
+    if budget < 3:
+        return np.union1d(keep, [0, n - 1])
+    share = budget // len(columns)
+    if share < 3:
+        columns, share = columns[:1], budget
+    positions = [lttb(column, share) for column in columns]
+    return np.unique(np.concatenate(positions + [keep]))
+
+
+#----------------------------------------------------------------------
+def get_extremes(series: pd.Series):
+    """(min, max) of the series at full resolution, None if all nan"""
+    if series.isnull().all():
+        return None
+    return float(np.nanmin(series)), float(np.nanmax(series))
+
+
+#----------------------------------------------------------------------
+def minmax_lines(low_name: str, high_name: str, extremes = None, **kwargs):
+    """the min/max mark lines, at the given full resolution (min, max) if
+    any, else computed by echarts on the data shown"""
+    if extremes is None:
+        return [opts.MarkLineItem(type_ = "min", name = low_name, **kwargs),
+                opts.MarkLineItem(type_ = "max", name = high_name, **kwargs)]
+    low, high = extremes
+    return [opts.MarkLineItem(y = low, name = low_name, **kwargs),
+            opts.MarkLineItem(y = high, name = high_name, **kwargs)]
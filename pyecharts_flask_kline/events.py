@@ -0,0 +1,66 @@
+# encoding: UTF-8
+
+import sys
+import json
+import threading
+from collections import deque
+
+
+#----------------------------------------------------------------------
+class Broadcaster(object):
+    """the recent events for the server-sent event streams.
+
+    the clients block on one shared condition, no queue per client, under
+    the gevent workers each waiting client is a greenlet, not a thread"""
+
+    #----------------------------------------------------------------------
+    def __init__(self, keep: int = 100):
+        self._cond = threading.Condition()
+        # (id, event, data) of the recent events
+        self._events = deque(maxlen = keep)
+        self._last_id = 0
+
+    #----------------------------------------------------------------------
+    @property
+    def last_id(self):
+        return self._last_id
+
+    #----------------------------------------------------------------------
+    def publish(self, event: str, data: dict):
+        with self._cond:
+            self._last_id += 1
+            self._events.append((self._last_id, event, data))
+            self._cond.notify_all()
+
+    #----------------------------------------------------------------------
+    def wait(self, last_id: int, timeout: float):
+        """the events after last_id, wait up to timeout for the first"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._last_id > last_id, timeout)
+            return [item for item in self._events if item[0] > last_id]
+
+    #----------------------------------------------------------------------
+    def stream(self, last_id: int = None, heartbeat: float = 30):
+        """the text/event-stream of the events after last_id, the new ones
+        only if None, a comment each heartbeat keeps the proxies open"""
+        # the ids are per worker process, the client may come from another
+        if last_id is None or last_id > self._last_id:
+            last_id = self._last_id
+        yield 'retry: 10000\n\n'
+        while True:
+            events = self.wait(last_id, heartbeat)
+            if not events:
+                yield ': keep-alive\n\n'
+            for last_id, event, data in events:
+                yield f'id: {last_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+#----------------------------------------------------------------------
+def is_async():
+    """the waiting streams are greenlets under the gevent workers, else each
+    holds a thread until closed"""
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('threading')
+
+
+broadcaster = Broadcaster()
@@ -0,0 +1,49 @@
+# encoding: UTF-8
+
+import numpy as np
+import pandas as pd
+
+
+#----------------------------------------------------------------------
+class FrozenFrame(pd.DataFrame):
+    """a read-only frame shared by the request handlers.
+
+    setting, inserting or deleting a column, replacing an axis and the
+    inplace methods raise TypeError, writing the values or the index raises
+    ValueError. the methods returning a new frame (slices, copy, assign)
+    return plain frames, the slices still share the read-only values."""
+
+    #----------------------------------------------------------------------
+    @property
+    def _constructor(self):
+        return pd.DataFrame
+
+    #----------------------------------------------------------------------
+    def _frozen(self, *args, **kwargs):
+        raise TypeError('can not modify a frozen frame, copy it first.')
+
+    # the columns
+    __setitem__ = __delitem__ = insert = pop = isetitem = _frozen
+    _set_item = _iset_item = _frozen
+    # the axes (df.index = ..., rename and set_index inplace) and the
+    # results of the other inplace methods
+    _set_axis = _set_axis_nocheck = _update_inplace = _frozen
+
+
+#----------------------------------------------------------------------
+def freeze_array(values):
+    """make the ndarray (or the ndarray of the datetime array) read-only"""
+    values = getattr(values, '_ndarray', values)
+    if isinstance(values, np.ndarray):
+        values.flags.writeable = False
+
+
+#----------------------------------------------------------------------
+def freeze_frame(df: pd.DataFrame):
+    """the frozen frame sharing the data of df"""
+    frozen = FrozenFrame(df)
+    for block in frozen._mgr.blocks:
+        freeze_array(block.values)
+    for axis in (frozen.index, frozen.columns):
+        freeze_array(axis._values)
+    return frozen
@@ -0,0 +1,74 @@
+# encoding: UTF-8
+
+# gunicorn config, run from the repo root:
+#   gunicorn -c ./pyecharts_flask_kline/gunicorn_conf.py wsgi:app
+# TERM stops gracefully, HUP warms the snapshots of the new data in the
+# master and replaces the workers gracefully
+
+import multiprocessing
+import configparser
+ini_config = configparser.ConfigParser()
+DATA_CONFIG_PATH = './data/data.ini'
+SERVER_SECTION = 'server'
+ini_config.read(DATA_CONFIG_PATH)
+
+pythonpath = './pyecharts_flask_kline'
+bind = ini_config.get(SERVER_SECTION, 'bind', fallback = '0.0.0.0:5000')
+# the worker processes, the cpu count if 0
+workers = ini_config.getint(SERVER_SECTION, 'workers', fallback = 0) or multiprocessing.cpu_count()
+# the threads of each worker
+threads = ini_config.getint(SERVER_SECTION, 'threads', fallback = 4)
+# gthread, or gevent to hold many idle event streams without a thread each,
+# the pages poll with gthread. the builds of the snapshots run in the real
+# threads of the gevent hub
+worker_class = ini_config.get(SERVER_SECTION, 'worker_class', fallback = 'gthread')
+if worker_class == 'gevent':
+    # patched before the app is preloaded, the locks and the conditions of
+    # the app must be the cooperative ones
+    from gevent import monkey
+    monkey.patch_all()
+# a cold build of the snapshots may take long
+timeout = ini_config.getint(SERVER_SECTION, 'timeout', fallback = 120)
+graceful_timeout = ini_config.getint(SERVER_SECTION, 'graceful_timeout', fallback = 30)
+# load the app and warm the snapshots once in the master
+preload_app = True
+
+
+#----------------------------------------------------------------------
+def when_ready(arbiter):
+    """each worker writes its metrics under the metrics path, merged by the
+    one scraped, the files of the last run are removed"""
+    import server
+    import metrics
+    metrics.set_metrics_dir(server.METRICS_PATH or None, clear = True)
+
+
+#----------------------------------------------------------------------
+def on_reload(arbiter):
+    """build the snapshots of the new trading date, or of the same date if
+    the collector wrote new data, in the master, the new workers are forked
+    with them"""
+    import server
+    server.warm_data()
+
+
+#----------------------------------------------------------------------
+def post_fork(arbiter, worker):
+    """the threads are not forked, each worker runs its own scheduler and
+    watcher of the data files"""
+    import server
+    server.start_background()
+
+
+#----------------------------------------------------------------------
+def worker_exit(arbiter, worker):
+    """the last metrics of the worker"""
+    import metrics
+    metrics.write_state()
+
+
+#----------------------------------------------------------------------
+def child_exit(arbiter, worker):
+    """the counters of the exited worker are kept, its gauges dropped"""
+    import metrics
+    metrics.retire(worker.pid)
@@ -0,0 +1,286 @@
+# encoding: UTF-8
+
+import os
+import json
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+
+# the prefix of all the exported metrics
+PREFIX = 'vix_web_viewer'
+# the upper bounds of the buckets
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = (1 << 10, 4 << 10, 16 << 10, 64 << 10, 256 << 10,
+                 1 << 20, 4 << 20, 16 << 20)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# the directory of the values of each worker merged on scrape, None to
+# export the values of this process only
+METRICS_DIR = None
+# the values of the exited workers, the counters only
+DEAD_FILE = 'dead.json'
+
+
+#----------------------------------------------------------------------
+class Histogram(object):
+    """a prometheus histogram with one label"""
+
+    #----------------------------------------------------------------------
+    def __init__(self, name: str, help: str, label: str, buckets: tuple):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # label value -> [counts of each bucket and +Inf, sum]
+        self._values = {}
+
+    #----------------------------------------------------------------------
+    def observe(self, label_value: str, value: float):
+        with self._lock:
+            entry = self._values.get(label_value)
+            if entry is None:
+                entry = self._values[label_value] = [[0] * (len(self.buckets) + 1), 0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+
+    #----------------------------------------------------------------------
+    def get_values(self):
+        """{label value: [counts, sum]}, a copy"""
+        with self._lock:
+            return {key: [list(counts), total]
+                    for key, (counts, total) in self._values.items()}
+
+    #----------------------------------------------------------------------
+    def render(self, values: dict = None):
+        """the lines of the exposition format, of the values of get_values()
+        (merged from the workers) if given"""
+        lines = [f'# HELP {self.name} {self.help}',
+                 f'# TYPE {self.name} histogram']
+        if values is None:
+            values = self.get_values()
+        for label_value, (counts, total) in sorted(values.items()):
+            label = f'{self.label}="{label_value}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf', ), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label}}} {total}')
+            lines.append(f'{self.name}_count{{{label}}} {cumulative}')
+        return lines
+
+
+STAGE_SECONDS = Histogram(f'{PREFIX}_stage_seconds',
+                          'the seconds spent in each stage of the handlers',
+                          'stage', SECONDS_BUCKETS)
+REQUEST_SECONDS = Histogram(f'{PREFIX}_request_seconds',
+                            'the seconds spent in each request',
+                            'endpoint', SECONDS_BUCKETS)
+RESPONSE_BYTES = Histogram(f'{PREFIX}_response_bytes',
+                           'the bytes of the response bodies sent',
+                           'endpoint', BYTES_BUCKETS)
+
+# the budget caches exported
+CACHES = []
+CACHE_GAUGES = ('entries', 'bytes', 'max_bytes', 'pinned')
+CACHE_COUNTERS = ('hits', 'misses', 'evictions', 'expirations', 'invalidations')
+HISTOGRAMS = (STAGE_SECONDS, REQUEST_SECONDS, RESPONSE_BYTES)
+
+# the spans of the current request if collected
+_request = threading.local()
+
+
+#----------------------------------------------------------------------
+def register_cache(cache):
+    """export the stats() of the budget cache"""
+    CACHES.append(cache)
+    return cache
+
+
+#----------------------------------------------------------------------
+def observe(stage: str, seconds: float):
+    """record the seconds of the stage, and into the spans of the request"""
+    STAGE_SECONDS.observe(stage, seconds)
+    spans = getattr(_request, 'spans', None)
+    if spans is not None:
+        spans[stage] = spans.get(stage, 0) + seconds
+
+
+#----------------------------------------------------------------------
+@contextmanager
+def span(stage: str):
+    """time the block as the stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+#----------------------------------------------------------------------
+def start_request():
+    """collect the spans of the current thread"""
+    _request.spans = {}
+
+
+#----------------------------------------------------------------------
+def finish_request():
+    """stop collecting, the {stage: seconds} of the request"""
+    spans = getattr(_request, 'spans', None)
+    _request.spans = None
+    return spans or {}
+
+
+#----------------------------------------------------------------------
+def server_timing(spans: dict):
+    """the Server-Timing header of the spans, durations in milliseconds"""
+    return ', '.join(f'{stage};dur={seconds * 1000:.3f}'
+                     for stage, seconds in spans.items())
+
+
+#----------------------------------------------------------------------
+def get_state():
+    """the values of the histograms and the caches of this process"""
+    return {'histograms': {histogram.name: histogram.get_values() for histogram in HISTOGRAMS},
+            'caches': {cache.name: cache.stats() for cache in CACHES}}
+
+
+#----------------------------------------------------------------------
+def merge_state(total: dict, state: dict, gauges: bool = True):
+    """add the values of state into total, the cache gauges only if gauges"""
+    for name, values in state['histograms'].items():
+        merged = total['histograms'].setdefault(name, {})
+        for label_value, (counts, value_sum) in values.items():
+            entry = merged.setdefault(label_value, [[0] * len(counts), 0])
+            entry[0] = [x + y for x, y in zip(entry[0], counts)]
+            entry[1] += value_sum
+    fields = CACHE_GAUGES + CACHE_COUNTERS if gauges else CACHE_COUNTERS
+    for name, stats in state['caches'].items():
+        merged = total['caches'].setdefault(name, dict.fromkeys(CACHE_GAUGES + CACHE_COUNTERS, 0))
+        for field in fields:
+            merged[field] += stats.get(field, 0)
+    return total
+
+
+#----------------------------------------------------------------------
+def is_metrics_file(name: str):
+    """<pid>.json, the dead file and the temp files written by write_json"""
+    if name.startswith('.'):
+        name, dot, pid = name[1:].rpartition('.')
+        if not pid.isdigit():
+            return False
+    stem, ext = os.path.splitext(name)
+    return ext == '.json' and (stem.isdigit() or name == DEAD_FILE)
+
+
+#----------------------------------------------------------------------
+def set_metrics_dir(path: str, clear: bool = False):
+    """merge the values of the workers through the files of path, in the
+    master before the workers are forked, the files written by the last run
+    removed if clear, the other files of path are left"""
+    global METRICS_DIR
+    METRICS_DIR = path
+    if path is None:
+        return
+    os.makedirs(path, exist_ok = True)
+    if clear:
+        for name in os.listdir(path):
+            file_path = os.path.join(path, name)
+            if is_metrics_file(name) and os.path.isfile(file_path):
+                os.remove(file_path)
+
+
+#----------------------------------------------------------------------
+def write_json(path: str, state: dict):
+    """replace the file atomically, the readers never see a partial one"""
+    tmp_path = os.path.join(os.path.dirname(path), f'.{os.path.basename(path)}.{os.getpid()}')
+    with open(tmp_path, 'w') as state_file:
+        json.dump(state, state_file)
+    os.replace(tmp_path, path)
+
+
+#----------------------------------------------------------------------
+def write_state():
+    """write the values of this worker to <pid>.json"""
+    if METRICS_DIR is not None:
+        write_json(os.path.join(METRICS_DIR, f'{os.getpid()}.json'), get_state())
+
+
+#----------------------------------------------------------------------
+def load_state():
+    """the values of all the workers, the live ones and the exited ones"""
+    total = {'histograms': {}, 'caches': {}}
+    for name in sorted(os.listdir(METRICS_DIR)):
+        if name.startswith('.') or not is_metrics_file(name):
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, name)) as state_file:
+                merge_state(total, json.load(state_file))
+        except (OSError, ValueError):
+            # retired meanwhile
+            continue
+    return total
+
+
+#----------------------------------------------------------------------
+def retire(pid: int):
+    """move the counters of the exited worker to the dead file, its gauges
+    are dropped, in the master"""
+    if METRICS_DIR is None:
+        return
+    path = os.path.join(METRICS_DIR, f'{pid}.json')
+    dead_path = os.path.join(METRICS_DIR, DEAD_FILE)
+    try:
+        with open(path) as state_file:
+            state = json.load(state_file)
+    except (OSError, ValueError):
+        return
+    total = {'histograms': {}, 'caches': {}}
+    if os.path.exists(dead_path):
+        with open(dead_path) as dead_file:
+            merge_state(total, json.load(dead_file))
+    write_json(dead_path, merge_state(total, state, gauges = False))
+    os.remove(path)
+
+
+#----------------------------------------------------------------------
+def start_writer(interval: float = 5):
+    """write the values of this worker every interval seconds, the other
+    workers see them at most that late"""
+    if METRICS_DIR is None:
+        return None
+    def run():
+        while True:
+            try:
+                write_state()
+            except OSError:
+                pass
+            time.sleep(interval)
+    writer = threading.Thread(target = run, name = 'metrics-writer', daemon = True)
+    writer.start()
+    return writer
+
+
+#----------------------------------------------------------------------
+def render():
+    """all the metrics in the prometheus text format, of all the workers if
+    the metrics dir is set, else of this process"""
+    if METRICS_DIR is None:
+        state = get_state()
+    else:
+        write_state()
+        state = load_state()
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render(state['histograms'].get(histogram.name, {})))
+    stats = list(state['caches'].items())
+    for field in CACHE_GAUGES:
+        name = f'{PREFIX}_cache_{field}'
+        lines.append(f'# TYPE {name} gauge')
+        lines.extend(f'{name}{{cache="{cache}"}} {values[field]}' for cache, values in stats)
+    for field in CACHE_COUNTERS:
+        name = f'{PREFIX}_cache_{field}_total'
+        lines.append(f'# TYPE {name} counter')
+        lines.extend(f'{name}{{cache="{cache}"}} {values[field]}' for cache, values in stats)
+    return '\n'.join(lines) + '\n'
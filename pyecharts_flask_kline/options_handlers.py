@@ -1,11 +1,10 @@
 #encoding: UTF-8
 
-from typing import List, Sequence, Union
-from functools import lru_cache
+from typing import List, NamedTuple, Sequence, Union
 from pyecharts import options as opts
 from pyecharts.charts import Kline, Line, Bar, Grid, Tab
 from pyecharts.globals import ThemeType, SymbolType
-from flask import render_template
+from flask import render_template, abort
 import talib
 
 
@@ -22,43 +21,339 @@ from options_monitor.utilities_calendar import get_last_trade_dates
 
 import pandas as pd
 
+from refresher import DataSnapshot, register
+from budget_cache import sizeof
+from frozen import freeze_frame
+import disk_cache
+from downsample import window_slice, sample_positions, get_extremes, minmax_lines
+from delta import dump_delta
+from transport import dump_dataset
+import simplejson as json
+from pyecharts.charts.base import default
+from metrics import span
+
 THEME_ME = ThemeType.DARK
 
+# the decimals of the series in the dataset transport
+DATASET_PRECISION = {
+    'kline': 4, 'k26': 4, 'upper': 4, 'lower': 4,
+    'siv': 2, 'hv20': 2, 'hv250': 2,
+    'tp': 1, 'ivp': 1, 'ivp_warn': 1,
+    'total': 0,
+}
+
+
+# (state, symbol, symbol size, color) of the state mark points
+STATE_MARK_STYLES = [
+    (STATE_IN_GAME_UP, SymbolType.ARROW, 15, 'fuchsia'),
+    (STATE_IN_GAME_DOWN, SymbolType.ROUND_RECT, 15, 'cyan'),
+    (STATE_KEEP_WATCHING_UP, SymbolType.DIAMOND, 10, 'fuchsia'),
+    (STATE_KEEP_WATCHING_DOWN, SymbolType.DIAMOND, 10, 'cyan'),
+]
+MARK_COLUMNS = ['pos', 'order', 'symbol', 'symbol_size', 'color']
+
+# the names of the states in the overview
+STATE_NAMES = {
+    STATE_IN_GAME_UP: 'in_game_up',
+    STATE_IN_GAME_DOWN: 'in_game_down',
+    STATE_KEEP_WATCHING_UP: 'keep_watching_up',
+    STATE_KEEP_WATCHING_DOWN: 'keep_watching_down',
+}
+# the columns of the overview, the latest values of each product
+OVERVIEW_COLUMNS = ['product', 'date', 'close', 'siv', 'ivp', 'hv20', 'hv250',
+                    'siv_hv20', 'hv20_hv250', 'tp', 'state', 'state_date']
+# the series of each product in the comparison chart
+COMPARE_COLUMNS = ['siv', 'hv20', 'hv250', 'ivp']
+COMPARE_COLORS = ['red', 'cyan', 'gold', 'lime', 'magenta', 'ivory', 'tan', 'plum', 'teal', 'crimson']
+
 
 #----------------------------------------------------------------------
-@lru_cache(maxsize = 1)
-def get_siv_info(now_date_str: str):
+def get_mark_table(data: pd.DataFrame):
+    """the mark points of the frame, one row per mark, in the order of
+    the rows, the volume mark before the state mark of the same row"""
+    with span('siv_mark_table'):
+        return _get_mark_table(data)
+
+
+#----------------------------------------------------------------------
+def _get_mark_table(data: pd.DataFrame):
+    positions = pd.RangeIndex(len(data))
+    tables = []
+    vol_pos = positions[(data[VOL_STATE_NAME] == True).to_numpy()]
+    tables.append(pd.DataFrame({'pos': vol_pos, 'order': 0,
+                                'symbol': SymbolType.DIAMOND,
+                                'symbol_size': 15, 'color': 'gold'},
+                               columns = MARK_COLUMNS))
+    state = data[STATE_NAME]
+    for st, symbol, ssize, color in STATE_MARK_STYLES:
+        state_pos = positions[(state == st).to_numpy()]
+        tables.append(pd.DataFrame({'pos': state_pos, 'order': 1,
+                                    'symbol': symbol,
+                                    'symbol_size': ssize, 'color': color},
+                                   columns = MARK_COLUMNS))
+    table = pd.concat(tables, ignore_index = True)
+    table.sort_values(['pos', 'order'], kind = 'mergesort', inplace = True)
+    table.reset_index(drop = True, inplace = True)
+    table['date'] = data.index.take(table['pos'])
+    table['close'] = data[CLOSE_PRICE_NAME].to_numpy().take(table['pos'])
+    return table
+
+
+#----------------------------------------------------------------------
+def get_mark_points(table: pd.DataFrame):
+    """the mark point items of the mark table"""
+    with span('siv_mark_points'):
+        return [opts.MarkPointItem(coord = [date, close],
+                                   symbol = symbol,
+                                   symbol_size = ssize,
+                                   itemstyle_opts = opts.ItemStyleOpts(color = color))
+                for date, close, symbol, ssize, color in zip(
+                        table['date'].tolist(), table['close'].tolist(),
+                        table['symbol'].tolist(), table['symbol_size'].tolist(),
+                        table['color'].tolist())]
+
+
+#----------------------------------------------------------------------
+def get_ivp_warn(ivp: pd.Series):
+    """the ivp in the warn zone, or the day before, drawn in red"""
+    ivp_shift_left = ivp.shift(-1)
+    return ivp[(ivp >= 91) | (ivp <= 15) |
+               (ivp_shift_left >= 91) | (ivp_shift_left <= 15)]
+
+
+#----------------------------------------------------------------------
+def get_derived_frame(data: pd.DataFrame):
+    """the columns derived from the prepared frame: ivp_warn and the
+    bollinger bands of the close price"""
+    # two lines to show ivp, normal ivp with cyan, warn vip for red.
+    with span('siv_bbands'):
+        upper, middle, lower = talib.BBANDS(data[CLOSE_PRICE_NAME],
+                                            timeperiod = 26,
+                                            nbdevup = 2,
+                                            nbdevdn = 2)
+    return pd.DataFrame({
+        'ivp_warn': get_ivp_warn(data[IV_PER]),
+        'upper': upper,
+        'middle': middle,
+        'lower': lower}, index = data.index)
+
+
+#----------------------------------------------------------------------
+def get_series_frame(data: pd.DataFrame, derived: pd.DataFrame):
+    """the y values of the kline chart by series name"""
+    series = pd.DataFrame({
+        'kline': data[CLOSE_PRICE_NAME],
+        'siv': data[IV_NAME] * 100,
+        'k26': derived['middle'],
+        'upper': derived['upper'],
+        'lower': derived['lower'],
+        'hv20': data[HV_20_NAME] * 100,
+        'hv250': data[HV_250_NAME] * 100,
+        'tp': data[TURNOVER_PER],
+        'ivp': data[IV_PER],
+        'ivp_warn': derived['ivp_warn'],
+        'total': data[TURNOVER_NAME]}, index = data.index)
+    if IV_C_NAME in data.columns:
+        series['total_c'] = data[IV_C_NAME]
+        series['total_p'] = data[IV_P_NAME]
+    return series
+
+
+#----------------------------------------------------------------------
+def get_overview_frame(frames: dict):
+    """the latest values of all the products, in one pass over the frames
+    concatenated by product group, the state is the last one set"""
+    if not frames:
+        return pd.DataFrame(columns = OVERVIEW_COLUMNS)
+    all_df = pd.concat(frames, names = ['product_rev', 'date'])
+    last = all_df.groupby(level = 0, sort = False).tail(1)
+    states = all_df[STATE_NAME]
+    states = states[states.isin(list(STATE_NAMES))]
+    last_states = states.groupby(level = 0, sort = False).tail(1)
+    product_revs = last.index.get_level_values(0)
+    products = {rev: product for product, rev in FUTURE_HV_NAMES_REVERSE.items()}
+    overview = pd.DataFrame({
+        'product': [products.get(rev, rev) for rev in product_revs],
+        'date': last.index.get_level_values(1),
+        'close': last[CLOSE_PRICE_NAME].to_numpy(),
+        'siv': last[IV_NAME].to_numpy() * 100,
+        'ivp': last[IV_PER].to_numpy(),
+        'hv20': last[HV_20_NAME].to_numpy() * 100,
+        'hv250': last[HV_250_NAME].to_numpy() * 100,
+        'tp': last[TURNOVER_PER].to_numpy()}, index = product_revs)
+    overview['siv_hv20'] = overview['siv'] - overview['hv20']
+    overview['hv20_hv250'] = overview['hv20'] - overview['hv250']
+    state_revs = last_states.index.get_level_values(0)
+    overview['state'] = pd.Series(last_states.map(STATE_NAMES).to_numpy(),
+                                  index = state_revs).reindex(product_revs).to_numpy()
+    overview['state_date'] = pd.Series(last_states.index.get_level_values(1),
+                                       index = state_revs).reindex(product_revs).to_numpy()
+    return overview[OVERVIEW_COLUMNS]
+
+
+#----------------------------------------------------------------------
+def get_compare_frame(series: dict):
+    """the compared series of the products on the union of their dates,
+    the columns are (product, series name)"""
+    return pd.concat({product: df[COMPARE_COLUMNS] for product, df in series.items()},
+                     axis = 1).sort_index()
+
+
+#----------------------------------------------------------------------
+class IVView(NamedTuple):
+    """the rows of a product up to the as-of date"""
+    data: pd.DataFrame
+    derived: pd.DataFrame
+    marks: pd.DataFrame
+
+
+#----------------------------------------------------------------------
+class SIVInfo(object):
+    """the prepared frames of a trading date with the per product tables,
+    all computed once per refresh and frozen, the handlers only read them"""
+
+    #----------------------------------------------------------------------
+    def __init__(self, frames: dict, derived: dict, marks: dict):
+        # product group -> frame / derived frame / mark table
+        self.frames = {key: freeze_frame(df) for key, df in frames.items()}
+        self.derived = {key: freeze_frame(df) for key, df in derived.items()}
+        self.marks = {key: freeze_frame(df) for key, df in marks.items()}
+        # the latest values of all the products
+        with span('siv_overview'):
+            self.overview = freeze_frame(get_overview_frame(self.frames))
+
+    #----------------------------------------------------------------------
+    @classmethod
+    def prepare(cls, frames: list):
+        """compute the per product tables of the prepared frames"""
+        all_frames, derived, marks = {}, {}, {}
+        for df in frames:
+            if not df.index.is_monotonic_increasing:
+                df = df.sort_index()
+            product_rev = df[PRODUCT_GROUP_NAME].iloc[0]
+            derived[product_rev] = get_derived_frame(df)
+            marks[product_rev] = get_mark_table(df)
+            all_frames[product_rev] = df
+        return cls(all_frames, derived, marks)
+
+    #----------------------------------------------------------------------
+    def dump(self):
+        """the frames to write to the disk snapshot"""
+        frames = {}
+        for name in ('frames', 'derived', 'marks'):
+            for product_rev, df in getattr(self, name).items():
+                frames[(name, product_rev)] = df
+        return frames, None
+
+    #----------------------------------------------------------------------
+    @classmethod
+    def restore(cls, frames: dict, extras):
+        """the info of the frames loaded from the disk snapshot"""
+        tables = {'frames': {}, 'derived': {}, 'marks': {}}
+        for (name, product_rev), df in frames.items():
+            tables[name][product_rev] = df
+        return cls(**tables)
+
+    #----------------------------------------------------------------------
+    def memory_usage(self):
+        """the bytes of all the tables"""
+        return sizeof([self.frames, self.derived, self.marks, self.overview])
+
+    #----------------------------------------------------------------------
+    def view(self, product_rev: str, as_of: str):
+        """the rows up to as_of, sliced without copy, None if not found"""
+        df = self.frames.get(product_rev)
+        if df is None:
+            return None
+        end = df.index.searchsorted(as_of, side = 'right')
+        marks = self.marks[product_rev]
+        derived = self.derived[product_rev].iloc[:end]
+        if 0 < end < len(df):
+            # the ivp_warn of the last row looks at the next day, after as_of
+            derived = derived.assign(ivp_warn = get_ivp_warn(df[IV_PER].iloc[:end]))
+        return IVView(df.iloc[:end], derived,
+                      marks.iloc[:marks['pos'].searchsorted(end)])
+
+
+#----------------------------------------------------------------------
+def prepare_siv_info(now_date_str: str):
     """analyze"""
     siv_mgr = SIVManager()
-    all_dfs = siv_mgr.prepare(None, now_date_str)
-    return all_dfs
+    with span('siv_prepare'):
+        all_dfs = siv_mgr.prepare(None, now_date_str)
+    with span('siv_tables'):
+        return SIVInfo.prepare(all_dfs)
+
+
+#----------------------------------------------------------------------
+def build_siv_info(now_date_str: str):
+    """load the snapshot on disk, or analyze and write it for the other
+    worker processes"""
+    return disk_cache.load_or_build('siv', now_date_str, prepare_siv_info,
+                                    SIVInfo.dump, SIVInfo.restore)
+
+
+#----------------------------------------------------------------------
+def get_now_date_str():
+    """the last trade date"""
+    return get_last_trade_dates()[-1]
+
+
+siv_snapshot = register(DataSnapshot('siv', build_siv_info, get_now_date_str))
+
+
+#----------------------------------------------------------------------
+def get_siv_info(now_date_str: str):
+    """the prepared frames, rebuilt in background when the date changed"""
+    with span('siv_snapshot'):
+        return siv_snapshot.get(now_date_str)
+
+
+#----------------------------------------------------------------------
+def get_as_of(date_str: str, now_date_str: str):
+    """the as-of date of the view, the date_str if it is a date before the
+    now date, else the now date"""
+    if date_str is None or len(date_str) != len(now_date_str):
+        return now_date_str
+    try:
+        if pd.Timestamp(date_str) < pd.Timestamp(now_date_str):
+            return date_str
+    except ValueError:
+        pass
+    return now_date_str
+
+
+#----------------------------------------------------------------------
+def get_iv_view(product: str, date_str: str):
+    """get the iv data with the derived columns and marks by product and
+    the as-of date"""
+    now_date_str = get_now_date_str()
+    info = get_siv_info(now_date_str)
+    as_of = get_as_of(date_str, now_date_str)
+    return info.view(FUTURE_HV_NAMES_REVERSE.get(product), as_of)
 
 
 #----------------------------------------------------------------------
 def get_iv_data(product: str, date_str: str):
     """get the iv data by contract and date"""
-    dates = get_last_trade_dates()
-    now_date_str = dates[-1]
-    analyze_dfs = get_siv_info(now_date_str)
-    product_rev = FUTURE_HV_NAMES_REVERSE.get(product)
-    for df in analyze_dfs:
-        if df[PRODUCT_GROUP_NAME][0] == product_rev:
-            return df[df.index <= now_date_str]
+    view = get_iv_view(product, date_str)
+    if view is not None:
+        return view.data
 
 
 #----------------------------------------------------------------------
-def kline_chart(data: pd.DataFrame, product: str):
+def kline_chart(data: pd.DataFrame, product: str,
+                mark_table: pd.DataFrame = None, derived: pd.DataFrame = None,
+                extremes: dict = None):
     # 最后的 Grid
     grid_chart = Grid(init_opts = opts.InitOpts(theme = THEME_ME))
     dates = data.index.to_list()
 
     colors = ['ivory', 'crimson', 'gold', 'cyan', 'teal', 'tan', 'white', 'plum', 'cyan', 'red', 'lime', 'gold', 'magenta']
 
-    # two lines to show ivp, normal ivp with cyan, warn vip for red.
-    ivp = data[IV_PER]
-    ivp_shift_left = ivp.shift(-1)
-    data['ivp_warn'] = data[IV_PER][(ivp >= 91) | (ivp <= 15) |
-                                    (ivp_shift_left >= 91) | (ivp_shift_left <= 15)]
+    if derived is None:
+        derived = get_derived_frame(data)
+    series = get_series_frame(data, derived)
 
     hv_show = True
     if not data[IV_NAME].isnull().all():
@@ -66,86 +361,47 @@ def kline_chart(data: pd.DataFrame, product: str):
 
     OLINE_STYLE = opts.LineStyleOpts(opacity = 0.8, width = 1.2)
 
-    upper, middle, lower = talib.BBANDS(data[CLOSE_PRICE_NAME],
-                                        timeperiod = 26,
-                                        nbdevup = 2,
-                                        nbdevdn = 2)
-    close_data = data[CLOSE_PRICE_NAME]
-    marks = []
+    if mark_table is None:
+        mark_table = get_mark_table(data)
+    if extremes is None:
+        extremes = {}
+    marks = get_mark_points(mark_table)
 
     total_c = []
     total_p = []
-    if IV_C_NAME in data.columns:
-        total_c = data[IV_C_NAME]
-        total_p = data[IV_P_NAME]
-
-    for idx, row in data.iterrows():
-        ssize = 10
-        if row[VOL_STATE_NAME] == True:
-            mi_vol = opts.MarkPointItem(
-                coord = [idx, row[CLOSE_PRICE_NAME]],
-                symbol = SymbolType.DIAMOND,
-                symbol_size = 15,
-                itemstyle_opts = opts.ItemStyleOpts(color = 'gold'))
-            marks.append(mi_vol)
-        if row[STATE_NAME] == STATE_IN_GAME_UP:
-            st = SymbolType.ARROW
-            style = opts.ItemStyleOpts(color = 'fuchsia')
-            ssize = 15
-        elif row[STATE_NAME] == STATE_IN_GAME_DOWN:
-            st = SymbolType.ROUND_RECT
-            style = opts.ItemStyleOpts(color = 'cyan')
-            ssize = 15
-        elif row[STATE_NAME] == STATE_KEEP_WATCHING_UP:
-            st = SymbolType.DIAMOND
-            style = opts.ItemStyleOpts(color = 'fuchsia')
-        elif row[STATE_NAME] == STATE_KEEP_WATCHING_DOWN:
-            st = SymbolType.DIAMOND
-            style = opts.ItemStyleOpts(color = 'cyan')
-        else:
-            continue
-        # append to marks
-        mi = opts.MarkPointItem(coord = [idx, row[CLOSE_PRICE_NAME]],
-                                symbol = st,
-                                symbol_size = ssize,
-                                itemstyle_opts = style)
-        marks.append(mi)
+    if 'total_c' in series.columns:
+        total_c = series['total_c']
+        total_p = series['total_p']
 
     kline = (
         Line(init_opts = opts.InitOpts())
         .add_xaxis(xaxis_data = dates)
         .add_yaxis(
             series_name = "kline",
-            y_axis = close_data,
+            y_axis = series['kline'],
             color = colors[-1],
             linestyle_opts = opts.LineStyleOpts(opacity = 1, width = 2.),
             markline_opts = opts.MarkLineOpts(
-                data = [
-                    opts.MarkLineItem(type_ = "min", name = "最低价", symbol = 'none'),
-                    opts.MarkLineItem(type_ = "max", name = "最高价", symbol = 'none'),
-                ]
+                data = minmax_lines("最低价", "最高价", extremes.get("kline"), symbol = 'none'),
             ),
             markpoint_opts=opts.MarkPointOpts(data = marks),
         )
         .add_yaxis(
             series_name = "siv",
-            y_axis = data[IV_NAME] * 100,
+            y_axis = series['siv'],
             yaxis_index = 1,
             is_symbol_show = False,
             # is_smooth=True,
             color = colors[-2],
             markline_opts = opts.MarkLineOpts(
-                data = [
-                    opts.MarkLineItem(type_ = "min", name = "ivl"),
-                    opts.MarkLineItem(type_ = "max", name = "ivh"),
-                ]
+                data = minmax_lines("ivl", "ivh", extremes.get("siv")),
             ),
             linestyle_opts = opts.LineStyleOpts(opacity = 1, width = 1.5),
             label_opts = opts.LabelOpts(is_show = False),
         )
         .add_yaxis(
             series_name = "k26",
-            y_axis = middle,
+            y_axis = series['k26'],
             is_symbol_show = False,
             is_selected = False,
             color = colors[-3],
@@ -154,7 +410,7 @@ def kline_chart(data: pd.DataFrame, product: str):
         )
         .add_yaxis(
             series_name = "upper",
-            y_axis = upper,
+            y_axis = series['upper'],
             is_symbol_show = False,
             is_selected = False,
             color = colors[-4],
@@ -163,7 +419,7 @@ def kline_chart(data: pd.DataFrame, product: str):
         )
         .add_yaxis(
             series_name = "lower",
-            y_axis = lower,
+            y_axis = series['lower'],
             is_symbol_show = False,
             is_selected = False,
             color = colors[-5],
@@ -172,7 +428,7 @@ def kline_chart(data: pd.DataFrame, product: str):
         )
         .add_yaxis(
             series_name = "hv20",
-            y_axis = data[HV_20_NAME] * 100,
+            y_axis = series['hv20'],
             yaxis_index = 1,
             is_symbol_show = False,
             is_selected = hv_show,
@@ -183,7 +439,7 @@ def kline_chart(data: pd.DataFrame, product: str):
         )
         .add_yaxis(
             series_name = "hv250",
-            y_axis = data[HV_250_NAME] * 100,
+            y_axis = series['hv250'],
             yaxis_index = 1,
             is_symbol_show = False,
             is_selected = hv_show,
@@ -195,7 +451,7 @@ def kline_chart(data: pd.DataFrame, product: str):
         .add_yaxis(
             series_name = "tp",
             # y_axis = data[IV_NAME].rolling(10).mean() * 100,
-            y_axis = data[TURNOVER_PER],
+            y_axis = series['tp'],
             yaxis_index = 2,
             is_symbol_show = False,
             is_selected = True,
@@ -208,7 +464,7 @@ def kline_chart(data: pd.DataFrame, product: str):
         )
         .add_yaxis(
             series_name = "ivp",
-            y_axis = ivp,
+            y_axis = series['ivp'],
             yaxis_index = 2,
             is_symbol_show = False,
             # is_smooth=True,
@@ -220,7 +476,7 @@ def kline_chart(data: pd.DataFrame, product: str):
         )
         .add_yaxis(
             series_name = "ivp_warn",
-            y_axis = data['ivp_warn'],
+            y_axis = series['ivp_warn'],
             yaxis_index = 2,
             is_symbol_show = False,
             color = colors[-10],
@@ -232,15 +488,12 @@ def kline_chart(data: pd.DataFrame, product: str):
         )
         .add_yaxis(
             series_name = "total",
-            y_axis = data[TURNOVER_NAME],
+            y_axis = series['total'],
             yaxis_index = 3,
             is_symbol_show = False,
             color = colors[-11],
             markline_opts = opts.MarkLineOpts(
-                data = [
-                    opts.MarkLineItem(type_ = "min", name = "total_l"),
-                    opts.MarkLineItem(type_ = "max", name = "total_h"),
-                ]
+                data = minmax_lines("total_l", "total_h", extremes.get("total")),
             ),
             linestyle_opts = opts.LineStyleOpts(
                 opacity = 0.7,
@@ -336,7 +589,199 @@ def get_template(product: str, date_str: str):
 
 
 #----------------------------------------------------------------------
-def get_data(product: str, date_str: str):
-    data = get_iv_data(product, date_str)
-    kline = kline_chart(data, product)
-    return kline.dump_options_with_quotes()
+def get_overview_template():
+    kwargs = {"date" : get_now_date_str(),
+              "tabs": FUTURE_HV_NAMES_REVERSE.keys()}
+    return render_template('overview.html', **kwargs)
+
+
+#----------------------------------------------------------------------
+def get_compare_products(products: str):
+    """the known products of the comma separated list, in order"""
+    names = []
+    for product in (products or '').split(','):
+        product = product.strip()
+        if product in FUTURE_HV_NAMES_REVERSE and product not in names:
+            names.append(product)
+    return names
+
+
+#----------------------------------------------------------------------
+def get_compare_template(products: list):
+    kwargs = {"products": products,
+              "date" : get_now_date_str(),
+              "tabs": FUTURE_HV_NAMES_REVERSE.keys()}
+    return render_template('compare.html', **kwargs)
+
+
+#----------------------------------------------------------------------
+def compare_chart(frame: pd.DataFrame, marks: dict):
+    """siv, hv20 and hv250 of the products on the left axis, ivp on the
+    right, the state marks on the siv lines"""
+    chart = (
+        Line(init_opts = opts.InitOpts(theme = THEME_ME))
+        .add_xaxis(xaxis_data = frame.index.to_list())
+    )
+    for i, product in enumerate(frame.columns.get_level_values(0).unique()):
+        color = COMPARE_COLORS[i % len(COMPARE_COLORS)]
+        chart.add_yaxis(
+            series_name = f"{product} siv",
+            y_axis = frame[(product, 'siv')],
+            is_symbol_show = False,
+            is_connect_nones = True,
+            color = color,
+            markpoint_opts = opts.MarkPointOpts(data = get_mark_points(marks[product])),
+            linestyle_opts = opts.LineStyleOpts(opacity = 1, width = 1.5),
+            label_opts = opts.LabelOpts(is_show = False),
+        )
+        for name, width, type_, selected in (('hv20', 1, 'dashed', True),
+                                             ('hv250', 1, 'dotted', False)):
+            chart.add_yaxis(
+                series_name = f"{product} {name}",
+                y_axis = frame[(product, name)],
+                is_symbol_show = False,
+                is_connect_nones = True,
+                is_selected = selected,
+                color = color,
+                linestyle_opts = opts.LineStyleOpts(opacity = 0.8, width = width, type_ = type_),
+                label_opts = opts.LabelOpts(is_show = False),
+            )
+        chart.add_yaxis(
+            series_name = f"{product} ivp",
+            y_axis = frame[(product, 'ivp')],
+            yaxis_index = 1,
+            is_symbol_show = False,
+            is_connect_nones = True,
+            is_selected = False,
+            color = color,
+            linestyle_opts = opts.LineStyleOpts(opacity = 0.6, width = 1),
+            label_opts = opts.LabelOpts(is_show = False),
+        )
+    return (
+        chart
+        .extend_axis(
+            yaxis = opts.AxisOpts(
+                name = 'ivp',
+                min_ = 0,
+                max_ = 100,
+                splitline_opts = opts.SplitLineOpts(is_show = False),
+            )
+        )
+        .set_global_opts(
+            title_opts = opts.TitleOpts(title = "siv compare", pos_left="0"),
+            xaxis_opts = opts.AxisOpts(
+                type_="category",
+                boundary_gap=False,
+                axisline_opts=opts.AxisLineOpts(is_on_zero=False),
+                splitline_opts=opts.SplitLineOpts(is_show=False),
+            ),
+            yaxis_opts = opts.AxisOpts(
+                name = 'iv',
+                position = "left",
+                is_scale = True,
+                axislabel_opts = opts.LabelOpts(formatter = "{value} %"),
+                splitline_opts = opts.SplitLineOpts(is_show = True),
+            ),
+            tooltip_opts = opts.TooltipOpts(trigger = "axis", axis_pointer_type = "line"),
+            legend_opts = opts.LegendOpts(is_show = True, type_ = "scroll"),
+            datazoom_opts = opts.DataZoomOpts(type_ = "slider", range_start = 0, range_end = 100),
+        )
+    )
+
+
+#----------------------------------------------------------------------
+def get_compare(products: list, date_str: str = None):
+    """the siv, hv and ivp of the products on one date axis, from the
+    derived frames and the mark tables of the refresh, nothing recomputed"""
+    series, marks = {}, {}
+    for product in products:
+        view = get_iv_view(product, date_str)
+        if view is None:
+            continue
+        series[product] = get_series_frame(view.data, view.derived)
+        # the state marks, on the siv line in place of the close price
+        table = pd.DataFrame(view.marks[view.marks['order'] == 1])
+        marks[product] = table.assign(close = series[product]['siv'].to_numpy().take(table['pos']))
+    if not series:
+        abort(404)
+    with span('siv_compare'):
+        frame = get_compare_frame(series)
+    with span('siv_chart'):
+        chart = compare_chart(frame, marks)
+    with span('siv_dump'):
+        return chart.dump_options_with_quotes()
+
+
+#----------------------------------------------------------------------
+def get_overview():
+    """the overview table of the now date as {date, columns, rows}, the
+    colors of the states beside"""
+    now_date_str = get_now_date_str()
+    overview = get_siv_info(now_date_str).overview
+    rounded = overview.round({name: 2 for name in OVERVIEW_COLUMNS[2:-2]})
+    return json.dumps({'date': now_date_str,
+                       'columns': OVERVIEW_COLUMNS,
+                       'rows': rounded.to_numpy().tolist(),
+                       'colors': {STATE_NAMES[st]: color
+                                  for st, symbol, ssize, color in STATE_MARK_STYLES}},
+                      default = default, ignore_nan = True)
+
+
+#----------------------------------------------------------------------
+def sample_view(view: IVView, points: int = None, start: str = None, end: str = None):
+    """the rows of the view between start and end, downsampled to at most
+    points rows by lttb if given, with the full resolution extremes of the
+    series with min/max mark lines. the rows with marks are always kept, so
+    more rows are returned if they are more than points"""
+    window = window_slice(view.data.index, start, end)
+    marks = view.marks
+    marks = marks.iloc[marks['pos'].searchsorted(window.start):
+                       marks['pos'].searchsorted(window.stop)]
+    data, derived = view.data.iloc[window], view.derived.iloc[window]
+    if points is None or points >= len(data):
+        return IVView(data, derived, marks), None
+    extremes = {'kline': get_extremes(data[CLOSE_PRICE_NAME]),
+                'siv': get_extremes(data[IV_NAME] * 100),
+                'total': get_extremes(data[TURNOVER_NAME])}
+    # keep the rows with marks, or the marks are lost from the category axis
+    positions = sample_positions([data[CLOSE_PRICE_NAME], data[IV_NAME]], points,
+                                 keep = marks['pos'].to_numpy() - window.start)
+    return IVView(data.iloc[positions], derived.iloc[positions], marks), extremes
+
+
+#----------------------------------------------------------------------
+def get_data(product: str, date_str: str,
+             points: int = None, start: str = None, end: str = None,
+             transport: str = None, precision: int = None):
+    view = get_iv_view(product, date_str)
+    if view is None:
+        abort(404)
+    with span('siv_sample'):
+        view, extremes = sample_view(view, points, start, end)
+    with span('siv_chart'):
+        kline = kline_chart(view.data, product, view.marks, view.derived, extremes)
+    with span('siv_dump'):
+        if transport is not None:
+            series = get_series_frame(view.data, view.derived)
+            if precision is None:
+                return dump_dataset(kline, series, transport, DATASET_PRECISION)
+            return dump_dataset(kline, series, transport, default_precision = precision)
+        return kline.dump_options_with_quotes()
+
+
+#----------------------------------------------------------------------
+def get_delta(product: str, since: str, date_str: str = None):
+    """the rows from since (sent again) up to the as-of date (the now date
+    if None) with their marks and the full resolution extremes of the mark
+    lines"""
+    view = get_iv_view(product, date_str)
+    if view is None:
+        abort(404)
+    series = get_series_frame(view.data, view.derived)
+    start = 0 if not since else view.data.index.searchsorted(since, side = 'left')
+    marks = view.marks.iloc[view.marks['pos'].searchsorted(start):]
+    marklines = {name: get_extremes(series[name]) for name in ('kline', 'siv', 'total')}
+    with span('siv_dump'):
+        return dump_delta(series, since,
+                          markpoints = {'kline': get_mark_points(marks)},
+                          marklines = marklines)
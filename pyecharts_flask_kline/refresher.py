@@ -0,0 +1,216 @@
+# encoding: UTF-8
+
+import logging
+import threading
+from concurrent.futures import Future
+
+from budget_cache import BudgetCache, MISSING
+from events import is_async
+
+
+logger = logging.getLogger(__name__)
+
+# all the snapshots watched by the scheduler
+SNAPSHOTS = []
+# the prepared frames of all the snapshots, limited by bytes
+FRAME_CACHE = BudgetCache('frames', 1 << 30)
+
+
+#----------------------------------------------------------------------
+def set_frame_budget(max_bytes: int, ttl: float = None):
+    """set the byte budget and the ttl of the prepared frames"""
+    FRAME_CACHE.max_bytes = max_bytes
+    FRAME_CACHE.ttl = ttl
+
+
+#----------------------------------------------------------------------
+def run_blocking(func, *args):
+    """func(*args) in a real thread of the hub if the threads are gevent
+    greenlets, the other greenlets (the requests, the heartbeat of the
+    worker) run meanwhile"""
+    if is_async():
+        import gevent
+        return gevent.get_hub().threadpool.apply(func, args)
+    return func(*args)
+
+
+#----------------------------------------------------------------------
+class DataSnapshot(object):
+    """the prepared data of one trading date.
+
+    the build runs in a background thread, concurrent callers share the one
+    in-flight build, and while a newer date is building the previous
+    snapshot is served (if serve_stale is set)."""
+
+    #----------------------------------------------------------------------
+    def __init__(self, name: str, build, current_key, serve_stale: bool = True,
+                 cache: BudgetCache = None):
+        """build(key) returns the new value, current_key() returns the
+        key (the trading date) the data should be prepared for, the values
+        are kept in the cache (FRAME_CACHE if None) keyed by (name, key)"""
+        self.name = name
+        self.serve_stale = serve_stale
+        self.cache = FRAME_CACHE if cache is None else cache
+        self._build = build
+        self._current_key = current_key
+        self._lock = threading.Lock()
+        self._key = None
+        self._inflight = {}
+        self._listeners = []
+
+    #----------------------------------------------------------------------
+    @property
+    def key(self):
+        return self._key
+
+    #----------------------------------------------------------------------
+    def current_key(self):
+        return self._current_key()
+
+    #----------------------------------------------------------------------
+    def add_listener(self, func):
+        """func(key, value) is called after each swap"""
+        self._listeners.append(func)
+
+    #----------------------------------------------------------------------
+    def get(self, key = None):
+        """get the value for key, the current key if None"""
+        if key is None:
+            key = self._current_key()
+        with self._lock:
+            value = self.cache.get((self.name, key))
+            if value is not MISSING:
+                return value
+            future = self._submit(key)
+            if self.serve_stale and self._key is not None:
+                value = self.cache.get((self.name, self._key), count = False)
+                if value is not MISSING:
+                    return value
+        return future.result()
+
+    #----------------------------------------------------------------------
+    def refresh(self, key = None):
+        """start the build for key if not started yet, return the future"""
+        if key is None:
+            key = self._current_key()
+        with self._lock:
+            return self._submit(key)
+
+    #----------------------------------------------------------------------
+    def invalidate(self):
+        """drop all the values, the next get builds again"""
+        with self._lock:
+            self._key = None
+            self.cache.invalidate(lambda cache_key: cache_key[0] == self.name)
+
+    #----------------------------------------------------------------------
+    def _submit(self, key):
+        """must be called with the lock held"""
+        future = self._inflight.get(key)
+        if future is None:
+            future = Future()
+            self._inflight[key] = future
+            threading.Thread(target = self._run, args = (key, future),
+                             name = f'refresh-{self.name}-{key}',
+                             daemon = True).start()
+        return future
+
+    #----------------------------------------------------------------------
+    def _run(self, key, future: Future):
+        try:
+            value = run_blocking(self._build, key)
+            # the value served is kept until the next swap, the cache may
+            # only evict or expire the values of the other keys
+            self.cache.pin((self.name, key))
+            self.cache.put((self.name, key), value)
+        except Exception as ex:
+            logger.exception('build %s for %s failed.', self.name, key)
+            with self._lock:
+                if key != self._key:
+                    self.cache.unpin((self.name, key))
+                self._inflight.pop(key, None)
+            future.set_exception(ex)
+            return
+        with self._lock:
+            if self._key != key:
+                self.cache.unpin((self.name, self._key))
+            # swap atomically, readers get either the old or the new one
+            self._key = key
+            self._inflight.pop(key, None)
+        for func in self._listeners:
+            try:
+                func(key, value)
+            except Exception:
+                logger.exception('listener of %s failed.', self.name)
+        # after the listeners, nothing is left running once the waiters return
+        future.set_result(value)
+
+
+#----------------------------------------------------------------------
+def register(snapshot: DataSnapshot):
+    """register the snapshot to the scheduler"""
+    SNAPSHOTS.append(snapshot)
+    return snapshot
+
+
+#----------------------------------------------------------------------
+def warm(snapshots = None, force: bool = False):
+    """build the snapshots (all the registered if None) for the current
+    keys and wait, e.g. in the master before forking the workers, the
+    snapshots of the current keys are rebuilt too if force"""
+    for snapshot in SNAPSHOTS if snapshots is None else snapshots:
+        try:
+            key = snapshot.current_key()
+            if force or key != snapshot.key:
+                snapshot.refresh(key).result()
+        except Exception:
+            logger.exception('warm %s failed.', snapshot.name)
+
+
+#----------------------------------------------------------------------
+class RefreshScheduler(threading.Thread):
+    """check the trading date periodically and prewarm the snapshots"""
+
+    #----------------------------------------------------------------------
+    def __init__(self, snapshots, interval: float = 60, setup = None):
+        """setup() is called in the thread before the first check, e.g. to
+        import the handlers which register the snapshots"""
+        super().__init__(name = 'refresh-scheduler', daemon = True)
+        self.snapshots = snapshots
+        self.interval = interval
+        self.setup = setup
+        self._stopped = threading.Event()
+
+    #----------------------------------------------------------------------
+    def check(self):
+        """start the build for each snapshot which is out of date"""
+        for snapshot in self.snapshots:
+            try:
+                key = snapshot.current_key()
+                if key != snapshot.key:
+                    snapshot.refresh(key)
+            except Exception:
+                logger.exception('check %s failed.', snapshot.name)
+
+    #----------------------------------------------------------------------
+    def run(self):
+        if self.setup is not None:
+            try:
+                self.setup()
+            except Exception:
+                logger.exception('setup of the scheduler failed.')
+        self.check()
+        while not self._stopped.wait(self.interval):
+            self.check()
+
+    #----------------------------------------------------------------------
+    def stop(self):
+        self._stopped.set()
+
+
+#----------------------------------------------------------------------
+def start_scheduler(interval: float = 60, setup = None):
+    """start the scheduler for all the registered snapshots"""
+    scheduler = RefreshScheduler(SNAPSHOTS, interval, setup)
+    scheduler.start()
+    return scheduler
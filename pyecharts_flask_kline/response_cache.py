@@ -0,0 +1,123 @@
+# encoding: UTF-8
+
+import gzip
+import hashlib
+import threading
+
+from flask import Response, request
+
+from budget_cache import BudgetCache, MISSING
+from metrics import span
+
+try:
+    import brotli
+except ImportError:
+    # brotli is optional, only gzip is served without it
+    brotli = None
+
+
+#----------------------------------------------------------------------
+class CachedBody(object):
+    """the serialized body with its precompressed versions"""
+
+    #----------------------------------------------------------------------
+    def __init__(self, body: bytes, mimetype: str = 'application/json'):
+        self.mimetype = mimetype
+        self.digest = hashlib.sha1(body).hexdigest()
+        self.encodings = {'identity': body,
+                          'gzip': gzip.compress(body, 6)}
+        if brotli is not None:
+            self.encodings['br'] = brotli.compress(body)
+
+    #----------------------------------------------------------------------
+    def memory_usage(self):
+        return sum(len(body) for body in self.encodings.values())
+
+    #----------------------------------------------------------------------
+    def etag(self, encoding: str):
+        """strong etag for each representation"""
+        if encoding == 'identity':
+            return self.digest
+        return f'{self.digest}-{encoding}'
+
+    #----------------------------------------------------------------------
+    def choose_encoding(self, accept_encoding):
+        """br before gzip before identity"""
+        for encoding in ('br', 'gzip'):
+            if encoding in self.encodings and accept_encoding[encoding]:
+                return encoding
+        return 'identity'
+
+    #----------------------------------------------------------------------
+    def make_response(self):
+        """answer the current request, 304 if the client has it already"""
+        encoding = self.choose_encoding(request.accept_encodings)
+        if_none_match = request.if_none_match
+        if any(if_none_match.contains(self.etag(enc)) for enc in self.encodings):
+            response = Response(status = 304)
+        else:
+            response = Response(self.encodings[encoding], mimetype = self.mimetype)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(self.etag(encoding))
+        response.headers['Vary'] = 'Accept-Encoding'
+        # always revalidate, it is cheap with the etag
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+
+#----------------------------------------------------------------------
+class ResponseCache(object):
+    """rendered responses keyed by (endpoint, product, data date, ...)"""
+
+    #----------------------------------------------------------------------
+    def __init__(self, max_bytes: int = 256 << 20, ttl: float = None):
+        self._lock = threading.Lock()
+        self.entries = BudgetCache('responses', max_bytes, ttl)
+        # bumped by invalidate, a render started before is not stored
+        self._generations = {}
+
+    #----------------------------------------------------------------------
+    def set_budget(self, max_bytes: int, ttl: float = None):
+        """set the byte budget and the ttl of the responses"""
+        self.entries.max_bytes = max_bytes
+        self.entries.ttl = ttl
+
+    #----------------------------------------------------------------------
+    def get(self, key: tuple, render):
+        """get the cached body for key, render() returns the str to cache"""
+        endpoint = key[0]
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not MISSING:
+                return entry
+            generation = self._generation(endpoint)
+        body = render()
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        with span('compress'):
+            entry = CachedBody(body)
+        with self._lock:
+            if self._generation(endpoint) == generation:
+                self.entries.put(key, entry)
+        return entry
+
+    #----------------------------------------------------------------------
+    def _generation(self, endpoint: str):
+        """must be called with the lock held"""
+        return (self._generations.get(None, 0), self._generations.get(endpoint, 0))
+
+    #----------------------------------------------------------------------
+    def respond(self, key: tuple, render):
+        """the flask response for key"""
+        return self.get(key, render).make_response()
+
+    #----------------------------------------------------------------------
+    def invalidate(self, endpoint: str = None):
+        """drop the entries of endpoint, all if None"""
+        with self._lock:
+            self._generations[endpoint] = self._generations.get(endpoint, 0) + 1
+            self.entries.invalidate(lambda key: endpoint is None or key[0] == endpoint)
+
+
+response_cache = ResponseCache()
@@ -1,52 +1,380 @@
 # encoding: UTF-8
 
-from flask import Flask
+from flask import Flask, Response, abort, g, request, send_file, stream_with_context
 
+import os
+import time
+import threading
 import configparser
 ini_config = configparser.ConfigParser()
 DATA_CONFIG_PATH = './data/data.ini'
 DATA_SECTION = 'data'
+SERVER_SECTION = 'server'
+WARNING_SECTION = 'warning'
 ini_config.read(DATA_CONFIG_PATH)
 
 # data path
 OPTIONS_DATA_PATH = ini_config.get(DATA_SECTION, 'options_monitor')
 CBOE_DATA_PATH = ini_config.get(DATA_SECTION, 'cboe_vix_gvz_ovx_monitor')
 
-# set the data path
-from options_monitor.data_ref import set_data_root as options_set_data_root
-options_set_data_root(OPTIONS_DATA_PATH)
+# the on-disk snapshots of the prepared frames shared by the workers, empty to disable
+CACHE_PATH = ini_config.get(SERVER_SECTION, 'cache_path',
+                            fallback = os.path.join(OPTIONS_DATA_PATH, 'viewer_cache'))
+# the prebuilt charts of static_snapshot.py served instead of rendering, empty to disable
+STATIC_PATH = ini_config.get(SERVER_SECTION, 'static_path',
+                             fallback = os.path.join(OPTIONS_DATA_PATH, 'viewer_static'))
+# the metrics of the gunicorn workers merged on scrape, empty to export those
+# of the worker scraped only
+METRICS_PATH = ini_config.get(SERVER_SECTION, 'metrics_path',
+                              fallback = os.path.join(OPTIONS_DATA_PATH, 'viewer_metrics'))
+# the directories of the server under the data paths, not watched
+SERVER_PATHS = [CACHE_PATH, STATIC_PATH, METRICS_PATH]
 
-from cboe_monitor.utilities import set_data_root as cboe_set_data_root
-cboe_set_data_root(CBOE_DATA_PATH)
+# the byte budgets (MB) and the ttl (seconds, 0 for none) of the caches
+FRAME_CACHE_MB = ini_config.getint(SERVER_SECTION, 'frame_cache_mb', fallback = 1024)
+RESPONSE_CACHE_MB = ini_config.getint(SERVER_SECTION, 'response_cache_mb', fallback = 256)
+CACHE_TTL = ini_config.getfloat(SERVER_SECTION, 'cache_ttl', fallback = 0) or None
 
-# handlers
-import options_handlers
-import cboe_handlers
+# seconds between the checks of a new trading date
+REFRESH_INTERVAL = ini_config.getfloat(SERVER_SECTION, 'refresh_interval', fallback = 60)
+# seconds between the checks of the data files, 0 to disable
+WATCH_INTERVAL = ini_config.getfloat(SERVER_SECTION, 'watch_interval', fallback = 5)
+# seconds between the keep-alive comments of the event streams
+SSE_HEARTBEAT = ini_config.getfloat(SERVER_SECTION, 'sse_heartbeat', fallback = 30)
+
+# the pool running the cboe data managers concurrently, thread or process
+CBOE_POOL = ini_config.get(SERVER_SECTION, 'cboe_pool', fallback = 'thread')
+CBOE_WORKERS = ini_config.getint(SERVER_SECTION, 'cboe_workers', fallback = 3)
+
+# the (enter, exit) thresholds of the warning areas by index, empty to disable
+WARNING_THRESHOLDS = {}
+if ini_config.has_section(WARNING_SECTION):
+    for name, value in ini_config.items(WARNING_SECTION):
+        WARNING_THRESHOLDS[name] = tuple(float(x) for x in value.split(',')) if value.strip() else None
+
+# add the Server-Timing header to all the responses, or only if ?timing=1
+SERVER_TIMING = ini_config.getboolean(SERVER_SECTION, 'server_timing', fallback = False)
+
+import refresher
+refresher.set_frame_budget(FRAME_CACHE_MB << 20, CACHE_TTL)
+from response_cache import response_cache
+response_cache.set_budget(RESPONSE_CACHE_MB << 20, CACHE_TTL)
+import metrics
+metrics.register_cache(refresher.FRAME_CACHE)
+metrics.register_cache(response_cache.entries)
+from events import broadcaster, is_async
+import static_snapshot
+static_snapshot.set_static_root(STATIC_PATH or None)
 
 app = Flask(__name__, static_folder="templates")
+import assets
+app.jinja_env.globals['asset_url'] = assets.url
+
+
+#----------------------------------------------------------------------
+def events_enabled():
+    """the pages subscribe to /events only if the data files are watched
+    and the idle streams cost no thread, else they poll"""
+    return WATCH_INTERVAL > 0 and is_async()
+
+app.jinja_env.globals['events_enabled'] = events_enabled
+
+# the handlers with pyecharts, pandas, talib and the data managers, imported
+# on first use so the server listens (and the workers spawn) without them
+options_handlers = None
+cboe_handlers = None
+HANDLERS_LOADED = False
+_handlers_lock = threading.Lock()
+
+
+#----------------------------------------------------------------------
+def load_handlers():
+    """set the data roots and import the handlers once"""
+    global options_handlers, cboe_handlers, HANDLERS_LOADED
+    if HANDLERS_LOADED:
+        return
+    with _handlers_lock:
+        if HANDLERS_LOADED:
+            return
+        # set the data path
+        from options_monitor.data_ref import set_data_root as options_set_data_root
+        options_set_data_root(OPTIONS_DATA_PATH)
+
+        from cboe_monitor.utilities import set_data_root as cboe_set_data_root
+        cboe_set_data_root(CBOE_DATA_PATH)
+
+        import disk_cache
+        disk_cache.set_cache_root(CACHE_PATH or None)
+
+        import options_handlers
+        import cboe_handlers
+        cboe_handlers.set_analyze_pool(CBOE_POOL, CBOE_WORKERS)
+        cboe_handlers.set_warning_thresholds(WARNING_THRESHOLDS)
+
+        # the rendered charts are dropped once the frames are refreshed,
+        # then the clients are told to fetch the new rows
+        for name, snapshot in (('siv', options_handlers.siv_snapshot),
+                               ('vix', cboe_handlers.vix_snapshot)):
+            snapshot.add_listener(lambda key, value, name = name: response_cache.invalidate(name))
+            snapshot.add_listener(lambda key, value, name = name:
+                                  broadcaster.publish('update', {'name': name, 'date': str(key)}))
+        HANDLERS_LOADED = True
+
+
+#----------------------------------------------------------------------
+def get_data_fingerprints():
+    """(files, size, last mtime ns) of the data files by snapshot name"""
+    from watcher import get_fingerprint
+    return {name: get_fingerprint(path, SERVER_PATHS)
+            for name, path in (('siv', OPTIONS_DATA_PATH), ('vix', CBOE_DATA_PATH))}
+
+
+#----------------------------------------------------------------------
+def update_data_versions(fingerprints: dict = None):
+    """set the data versions from the files, the names whose version is not
+    the one set before, in this process or the master it is forked from"""
+    import disk_cache
+    if fingerprints is None:
+        fingerprints = get_data_fingerprints()
+    changed = []
+    for name, fingerprint in fingerprints.items():
+        if disk_cache.DATA_VERSIONS.get(name) != fingerprint[2]:
+            disk_cache.set_data_version(name, fingerprint[2])
+            changed.append(name)
+    return changed
+
+
+#----------------------------------------------------------------------
+def get_snapshot(name: str):
+    load_handlers()
+    return {'siv': options_handlers.siv_snapshot,
+            'vix': cboe_handlers.vix_snapshot}[name]
+
+
+#----------------------------------------------------------------------
+def warm_data():
+    """build the snapshots of the current dates and data files and wait, in
+    the master before the workers are forked, the same dates are rebuilt
+    if the collector wrote new data since"""
+    load_handlers()
+    changed = update_data_versions()
+    for name in ('siv', 'vix'):
+        refresher.warm([get_snapshot(name)], force = name in changed)
 
 
+#----------------------------------------------------------------------
+def on_data_changed(name: str, version: int):
+    """the collector wrote new data, rebuild the snapshot of the current
+    date from it, the snapshots on disk of the older data are not used"""
+    import disk_cache
+    disk_cache.set_data_version(name, version)
+    get_snapshot(name).refresh()
+
+
+#----------------------------------------------------------------------
+def start_background():
+    """start the scheduler and the watcher of the data files, the handlers
+    are loaded by the scheduler if not yet. the data versions are set
+    first, a worker forked after the data changed rebuilds the snapshots
+    of the master"""
+    fingerprints = get_data_fingerprints()
+    for name in update_data_versions(fingerprints):
+        if HANDLERS_LOADED and get_snapshot(name).key is not None:
+            get_snapshot(name).refresh()
+    refresher.start_scheduler(REFRESH_INTERVAL, setup = load_handlers)
+    metrics.start_writer()
+    if WATCH_INTERVAL > 0:
+        from watcher import DataWatcher
+        DataWatcher({'siv': OPTIONS_DATA_PATH, 'vix': CBOE_DATA_PATH},
+                    on_data_changed, WATCH_INTERVAL,
+                    exclude = SERVER_PATHS,
+                    fingerprints = fingerprints).start()
+
+
+@app.before_request
+def start_timing():
+    g.request_start = time.perf_counter()
+    metrics.start_request()
+
+@app.after_request
+def finish_timing(response):
+    spans = metrics.finish_request()
+    seconds = time.perf_counter() - g.request_start
+    endpoint = request.endpoint or 'unknown'
+    metrics.REQUEST_SECONDS.observe(endpoint, seconds)
+    if response.content_length is not None:
+        metrics.RESPONSE_BYTES.observe(endpoint, response.content_length)
+    if SERVER_TIMING or request.args.get('timing') == '1':
+        spans['total'] = seconds
+        response.headers['Server-Timing'] = metrics.server_timing(spans)
+    return response
+
+
+#----------------------------------------------------------------------
+def get_sample_args():
+    """the optional ?points=N&from=&to= window and downsampling of the data
+    to at most N rows (more only if the rows of the marks are more), and
+    the ?format=dataset|f32&precision=N transport"""
+    from transport import TRANSPORTS
+    transport = request.args.get('format')
+    if transport not in TRANSPORTS:
+        transport = None
+    return (request.args.get('points', type = int),
+            request.args.get('from'), request.args.get('to'),
+            transport, request.args.get('precision', type = int))
+
+
+#----------------------------------------------------------------------
+def send_prebuilt(name: str, date_key: str, product: str, sample_args: tuple, key):
+    """the payload of the static snapshot if built for the date from the
+    current data and not sampled, else None to render it"""
+    points, start, end, transport, precision = sample_args
+    if points is not None or start or end or precision is not None \
+       or transport not in static_snapshot.TRANSPORTS:
+        return None
+    import disk_cache
+    if disk_cache.DATA_VERSIONS.get(name) is None:
+        # not started by start_background or warm_data
+        update_data_versions()
+    payload = static_snapshot.get_payload_name(
+        name if product is None else f'{name}/{product}', transport)
+    found = static_snapshot.find(name, date_key, payload, key,
+                                 disk_cache.DATA_VERSIONS[name])
+    if found is None:
+        return None
+    return static_snapshot.send(*found)
+
+
+@app.route("/metrics")
+def metrics_data():
+    """the prometheus metrics of all the workers, or of this process if the
+    metrics path is not set"""
+    return Response(metrics.render(), content_type = metrics.CONTENT_TYPE)
+
+@app.route("/events")
+def events():
+    """the server-sent events, update when the data of siv or vix changed,
+    204 stops the reconnects if not enabled"""
+    if not events_enabled():
+        return Response(status = 204)
+    last_id = request.headers.get('Last-Event-ID', type = int)
+    return Response(stream_with_context(broadcaster.stream(last_id, SSE_HEARTBEAT)),
+                    mimetype = 'text/event-stream',
+                    headers = {'Cache-Control': 'no-cache',
+                               'X-Accel-Buffering': 'no'})
+
+@app.route("/assets/<filename>")
+def asset(filename: str):
+    """the scripts of the pages by the hashed url, cached forever"""
+    response = assets.respond(filename)
+    if response is None:
+        abort(404)
+    return response
+
 @app.route("/uploads/options/<date_str>")
 def options_table(date_str: str):
     return app.send_static_file(date_str)
 
+@app.route("/uploads/options/<date_str>/manifest.json")
+def options_manifest(date_str: str):
+    """the manifest of the static snapshot of the date if built"""
+    path = static_snapshot.get_date_path('siv', date_str)
+    if path is None or not os.path.exists(os.path.join(path, static_snapshot.MANIFEST_FILE)):
+        abort(404)
+    return send_file(os.path.join(path, static_snapshot.MANIFEST_FILE),
+                     mimetype = 'application/json', max_age = 0)
+
+@app.route("/uploads/options/<date_str>/<path:payload>")
+def options_prebuilt(date_str: str, payload: str):
+    """a payload of the static snapshot, siv/<product>[.f32]"""
+    found = static_snapshot.find('siv', date_str, payload)
+    if found is None:
+        abort(404)
+    return static_snapshot.send(*found)
+
 @app.route("/<product>/<date_str>")
 def options(product: str, date_str: str):
+    load_handlers()
     return options_handlers.get_template(product, date_str)
 
+@app.route("/siv/overview")
+def options_overview():
+    load_handlers()
+    return options_handlers.get_overview_template()
+
+@app.route("/siv/overview/data")
+def options_overview_data():
+    """the latest values of all the products"""
+    load_handlers()
+    key = ('siv', None, 'overview', options_handlers.siv_snapshot.current_key(), None)
+    return response_cache.respond(key, options_handlers.get_overview)
+
+@app.route("/siv/compare")
+def options_compare():
+    """?products=a,b,c on one chart"""
+    load_handlers()
+    products = options_handlers.get_compare_products(request.args.get('products'))
+    return options_handlers.get_compare_template(products)
+
+@app.route("/siv/compare/data")
+def options_compare_data():
+    """the siv, hv and ivp of ?products=a,b,c up to ?date="""
+    load_handlers()
+    products = tuple(options_handlers.get_compare_products(request.args.get('products')))
+    date_str = request.args.get('date')
+    key = ('siv', None, 'compare', options_handlers.siv_snapshot.current_key(),
+           (products, date_str))
+    return response_cache.respond(
+        key, lambda: options_handlers.get_compare(products, date_str))
+
 @app.route("/siv/<product>/<date_str>")
 def options_data(product: str, date_str: str):
     """kline data"""
-    return options_handlers.get_data(product, date_str)
+    load_handlers()
+    sample_args = get_sample_args()
+    current_key = options_handlers.siv_snapshot.current_key()
+    response = send_prebuilt('siv', date_str, product, sample_args, current_key)
+    if response is not None:
+        return response
+    key = ('siv', product, date_str, current_key, sample_args)
+    return response_cache.respond(
+        key, lambda: options_handlers.get_data(product, date_str, *sample_args))
+
+@app.route("/siv/<product>/data")
+def options_delta(product: str):
+    """the kline data from ?since=<date> up to the as-of ?date="""
+    load_handlers()
+    since = request.args.get('since')
+    date_str = request.args.get('date')
+    key = ('siv', product, 'delta', options_handlers.siv_snapshot.current_key(),
+           (since, date_str))
+    return response_cache.respond(
+        key, lambda: options_handlers.get_delta(product, since, date_str))
 
 @app.route("/vix")
 def vix():
+    load_handlers()
     return cboe_handlers.get_template()
 
 @app.route("/vix/data")
 def vix_data():
-    return cboe_handlers.get_data()
+    load_handlers()
+    since = request.args.get('since')
+    if since is not None:
+        key = ('vix', None, 'delta', cboe_handlers.vix_snapshot.current_key(), since)
+        return response_cache.respond(key, lambda: cboe_handlers.get_delta(since))
+    sample_args = get_sample_args()
+    current_key = cboe_handlers.vix_snapshot.current_key()
+    response = send_prebuilt('vix', current_key, None, sample_args, current_key)
+    if response is not None:
+        return response
+    key = ('vix', None, None, current_key, sample_args)
+    return response_cache.respond(
+        key, lambda: cboe_handlers.get_data(*sample_args))
 
 
 if __name__ == "__main__":
+    # prewarm the data before the users ask, the handlers are loaded by
+    # the scheduler while the server starts listening
+    start_background()
     app.run(host='0.0.0.0')
@@ -0,0 +1,234 @@
+# encoding: UTF-8
+
+"""render the chart payloads of a trading date into precompressed static
+files, served by the routes instead of rendering, run from the repo root:
+
+    python ./pyecharts_flask_kline/static_snapshot.py [--date 20201231] [--workers 4]
+
+the files of each build are written under a new version, the manifest of
+the date points to the last one"""
+
+import os
+import gzip
+import json
+import time
+import shutil
+import hashlib
+import logging
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import request, send_file
+
+try:
+    import brotli
+except ImportError:
+    # brotli is optional, only gzip is written without it
+    brotli = None
+
+
+logger = logging.getLogger(__name__)
+
+# the root of the static snapshots, disabled if None
+STATIC_ROOT = None
+# the versions kept for each date
+KEEP_VERSIONS = 2
+MANIFEST_FILE = 'manifest.json'
+ENCODING_SUFFIXES = {'identity': '', 'gzip': '.gz', 'br': '.br'}
+# the transports of the payloads built, None for the pyecharts options
+TRANSPORTS = (None, 'f32')
+
+
+#----------------------------------------------------------------------
+def set_static_root(path: str):
+    """set the root of the static snapshots, None to disable"""
+    global STATIC_ROOT
+    STATIC_ROOT = path
+
+
+#----------------------------------------------------------------------
+def get_payload_name(name: str, transport: str = None):
+    """siv/<product> or vix, with the transport suffix"""
+    return name if transport is None else f'{name}.{transport}'
+
+
+#----------------------------------------------------------------------
+def write_payload(path: str, body: bytes):
+    """write the body with the precompressed versions, the etag and the
+    encodings written"""
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    encodings = {'identity': body, 'gzip': gzip.compress(body, 9)}
+    if brotli is not None:
+        encodings['br'] = brotli.compress(body)
+    for encoding, data in encodings.items():
+        with open(path + ENCODING_SUFFIXES[encoding], 'wb') as payload_file:
+            payload_file.write(data)
+    return {'etag': hashlib.sha1(body).hexdigest(),
+            'encodings': list(encodings)}
+
+
+#----------------------------------------------------------------------
+def render_siv(product: str, date_str: str, version_path: str):
+    """render the payloads of a product, run in the process pool"""
+    import options_handlers
+    entries = {}
+    for transport in TRANSPORTS:
+        name = get_payload_name(f'siv/{product}', transport)
+        body = options_handlers.get_data(product, date_str, transport = transport)
+        entries[name] = write_payload(os.path.join(version_path, name + '.json'),
+                                      body.encode('utf-8'))
+    return entries
+
+
+#----------------------------------------------------------------------
+def render_vix(version_path: str):
+    import cboe_handlers
+    entries = {}
+    for transport in TRANSPORTS:
+        name = get_payload_name('vix', transport)
+        body = cboe_handlers.get_data(transport = transport)
+        entries[name] = write_payload(os.path.join(version_path, name + '.json'),
+                                      body.encode('utf-8'))
+    return entries
+
+
+#----------------------------------------------------------------------
+def write_manifest(path: str, manifest: dict):
+    """replace the manifest atomically, then drop the old versions"""
+    tmp_path = os.path.join(path, f'.{MANIFEST_FILE}.{os.getpid()}')
+    with open(tmp_path, 'w') as manifest_file:
+        json.dump(manifest, manifest_file)
+    os.replace(tmp_path, os.path.join(path, MANIFEST_FILE))
+    versions = sorted(entry for entry in os.listdir(path)
+                      if entry != MANIFEST_FILE and not entry.startswith('.'))
+    for old in versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(path, old), ignore_errors = True)
+
+
+#----------------------------------------------------------------------
+def build(name: str, date_key: str, key: str, render_args: list, render,
+          workers: int = None, data_version: int = None):
+    """render the payloads into a new version of <root>/<name>/<date_key>,
+    render(*args, version_path) returns the entries of the manifest, key is
+    the current key of the snapshot rendered from"""
+    path = os.path.join(STATIC_ROOT, name, str(date_key))
+    version = time.strftime('%Y%m%d%H%M%S')
+    version_path = os.path.join(path, version)
+    files = {}
+    # forked whatever the default start method, the workers share the
+    # prepared frames and the loaded handlers of the parent
+    with ProcessPoolExecutor(max_workers = workers,
+                             mp_context = multiprocessing.get_context('fork')) as executor:
+        futures = [executor.submit(render, *args, version_path) for args in render_args]
+        for future in futures:
+            files.update(future.result())
+    manifest = {'date': str(date_key),
+                'key': str(key),
+                'version': version,
+                'data_version': data_version,
+                'files': {payload: dict(entry, path = f'{version}/{payload}.json')
+                          for payload, entry in files.items()}}
+    write_manifest(path, manifest)
+    return manifest
+
+
+#----------------------------------------------------------------------
+def get_date_path(name: str, date_key: str):
+    """<root>/<name>/<date_key>, None if disabled"""
+    if STATIC_ROOT is None or not date_key:
+        return None
+    return os.path.join(STATIC_ROOT, name, os.path.basename(str(date_key)))
+
+
+#----------------------------------------------------------------------
+def load_manifest(name: str, date_key: str):
+    """the manifest of the date, None if not built"""
+    path = get_date_path(name, date_key)
+    if path is None:
+        return None
+    try:
+        with open(os.path.join(path, MANIFEST_FILE)) as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return None
+
+
+#----------------------------------------------------------------------
+def find(name: str, date_key: str, payload: str, key: str = None,
+         data_version: int = None):
+    """(path, entry) of the payload in the static snapshot of the date, None
+    if not built, built from another key or older than the data version"""
+    manifest = load_manifest(name, date_key)
+    if manifest is None or (key is not None and manifest['key'] != str(key)):
+        return None
+    if data_version is not None and (manifest['data_version'] or 0) < data_version:
+        # the data changed after the build
+        return None
+    entry = manifest['files'].get(payload)
+    if entry is None:
+        return None
+    return os.path.join(get_date_path(name, date_key), entry['path']), entry
+
+
+#----------------------------------------------------------------------
+def send(path: str, entry: dict):
+    """send the precompressed file accepted by the client, 304 if the
+    client has it already"""
+    encoding = 'identity'
+    for candidate in ('br', 'gzip'):
+        if candidate in entry['encodings'] and request.accept_encodings[candidate]:
+            encoding = candidate
+            break
+    etag = entry['etag'] if encoding == 'identity' else f'{entry["etag"]}-{encoding}'
+    response = send_file(path + ENCODING_SUFFIXES[encoding],
+                         mimetype = 'application/json', etag = etag,
+                         conditional = True, max_age = None)
+    if encoding != 'identity' and response.status_code != 304:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+#----------------------------------------------------------------------
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--date', help = 'the as-of date of the siv charts, '
+                        'the last trade date if not set')
+    parser.add_argument('--workers', type = int, default = None,
+                        help = 'the processes rendering the products, the cpu count if not set')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level = logging.INFO)
+
+    import server
+    server.load_handlers()
+    # run as __main__, not the module imported by the server
+    set_static_root(server.STATIC_PATH or None)
+    if STATIC_ROOT is None:
+        parser.error('the static_path of data.ini is empty')
+    import options_handlers
+    import cboe_handlers
+    # the same versions as the watchers of the server
+    fingerprints = server.get_data_fingerprints()
+
+    now_date_str = options_handlers.get_now_date_str()
+    date_str = args.date or now_date_str
+    # prepared once here, before the pool is forked
+    options_handlers.get_siv_info(now_date_str)
+    products = [(product, date_str) for product in options_handlers.FUTURE_HV_NAMES_REVERSE
+                if options_handlers.get_iv_view(product, date_str) is not None]
+    manifest = build('siv', date_str, now_date_str, products, render_siv, args.workers,
+                     fingerprints['siv'][2])
+    logger.info('siv of %s built: %d files, version %s.', date_str,
+                len(manifest['files']), manifest['version'])
+
+    last_day = cboe_handlers.get_last_day()
+    cboe_handlers.get_vix_info(last_day)
+    manifest = build('vix', last_day, last_day, [()], render_vix, 1,
+                     fingerprints['vix'][2])
+    logger.info('vix of %s built, version %s.', last_day, manifest['version'])
+
+
+if __name__ == '__main__':
+    main()
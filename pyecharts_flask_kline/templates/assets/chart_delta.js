@@ -0,0 +1,136 @@
+// append the delta from /siv/<product>/data or /vix/data?since= to the chart
+
+// the last x of the chart, the since of the next delta
+function chartLastDate(chart) {
+    var option = chart.getOption();
+    if (option.dataset && option.dataset.length > 0) {
+        var dates = option.dataset[0].source.date;
+        return dates.length > 0 ? dates[dates.length - 1] : null;
+    }
+    var data = option.series[0].data;
+    if (!data || data.length == 0) {
+        return null;
+    }
+    var last = data[data.length - 1];
+    return Array.isArray(last) ? last[0] : option.xAxis[0].data[data.length - 1];
+}
+
+// the count of the rows of the chart before first, the rows from first on
+// are sent again by the delta and replaced
+function rowsBefore(xs, first) {
+    var n = xs.length;
+    while (n > 0 && xs[n - 1] >= first) {
+        n--;
+    }
+    return n;
+}
+
+// merge the delta into the chart, only the new rows and the last one the
+// chart has (its derived values may have changed) are transferred
+function appendDelta(chart, delta) {
+    var option = chart.getOption();
+    var update = {series: []};
+    var hasDataset = option.dataset && option.dataset.length > 0;
+    if (delta.xaxis.length == 0) {
+        return;
+    }
+    var first = delta.xaxis[0];
+    var axis = option.xAxis[0].data;
+    var axisRows = axis ? rowsBefore(axis, first) : 0;
+    if (axis) {
+        update.xAxis = [{data: axis.slice(0, axisRows).concat(delta.xaxis)}];
+    }
+    if (hasDataset) {
+        // the series share the dataset, append to its columns
+        var source = $.extend({}, option.dataset[0].source);
+        var rows = rowsBefore(source.date, first);
+        source.date = source.date.slice(0, rows).concat(delta.xaxis);
+        Object.keys(delta.series).forEach(function (name) {
+            if (source[name] !== undefined) {
+                source[name] = source[name].slice(0, rows).concat(delta.series[name].map(function (v) {
+                    return v === null ? '-' : v;
+                }));
+            }
+        });
+        update.dataset = [{source: source}];
+    }
+    option.series.forEach(function (series) {
+        var changed = {name: series.name};
+        var values = delta.series[series.name];
+        if (values !== undefined && !hasDataset) {
+            var data = series.data || [];
+            var rows = data.length > 0 && Array.isArray(data[0]) ?
+                rowsBefore(data.map(function (item) { return item[0]; }), first) :
+                Math.min(axisRows, data.length);
+            changed.data = data.slice(0, rows).concat(delta.xaxis.map(function (x, i) {
+                return [x, values[i]];
+            }));
+        }
+        // the marks from first on are sent again
+        var marks = (delta.markpoints || {})[series.name];
+        if (marks && series.markPoint) {
+            changed.markPoint = {data: (series.markPoint.data || []).filter(function (mark) {
+                return !(mark.coord && mark.coord[0] >= first);
+            }).concat(marks)};
+        }
+        // only the explicit (full resolution) mark lines need the update,
+        // the min/max types are recomputed by echarts
+        var extremes = (delta.marklines || {})[series.name];
+        var lines = series.markLine && series.markLine.data;
+        if (extremes && lines && lines.length == 2 && lines[0].type === undefined) {
+            changed.markLine = {data: [
+                $.extend({}, lines[0], {yAxis: extremes[0]}),
+                $.extend({}, lines[1], {yAxis: extremes[1]})]};
+        }
+        // the series with their own areas (gvz, ovx) do not take the shared ones
+        var newAreas = (delta.seriesareas || {})[series.name];
+        if (newAreas === undefined) {
+            newAreas = delta.markareas;
+        }
+        if (newAreas && series.markArea) {
+            // the areas ended from first on may be extended or moved, the
+            // delta has all of them
+            var areas = (series.markArea.data || []).filter(function (area) {
+                return area[1].xAxis < first;
+            });
+            changed.markArea = {data: areas.concat(newAreas.map(function (area) {
+                return [{name: 'warn', xAxis: area[0]}, {xAxis: area[1]}];
+            }))};
+        }
+        update.series.push(changed);
+    });
+    chart.setOption(update);
+}
+
+// fetch the rows after the last date of the chart and append them
+function refreshChart(chart, url) {
+    var since = chartLastDate(chart);
+    if (since === null) {
+        return;
+    }
+    $.ajax({
+        type: "GET",
+        url: url,
+        data: {since: since},
+        dataType: 'json',
+        success: function (delta) {
+            appendDelta(chart, delta);
+        }
+    });
+}
+
+// call onUpdate(date) when the server says the data of name (siv, vix) is updated,
+// or every 5 minutes if the server has no event streams
+function subscribeUpdates(name, onUpdate, enabled) {
+    if (!enabled) {
+        return setInterval(function () { onUpdate(null); }, 300000);
+    }
+    var source = new EventSource('/events');
+    source.addEventListener('update', function (event) {
+        var update = JSON.parse(event.data);
+        if (update.name == name) {
+            onUpdate(update.date);
+        }
+    });
+    return source;
+}
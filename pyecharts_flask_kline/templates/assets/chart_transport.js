@@ -0,0 +1,24 @@
+// decode the compact transports of /siv/<product>/<date> and /vix/data
+
+// base64 float32 columns into the dataset source, see transport.py
+function decodeDataset(option) {
+    var dataset = option.dataset;
+    if (!dataset || dataset.encoding !== 'f32') {
+        return option;
+    }
+    var source = {date: dataset.date};
+    Object.keys(dataset.columns).forEach(function (name) {
+        var bytes = atob(dataset.columns[name]);
+        var buffer = new Uint8Array(bytes.length);
+        for (var i = 0; i < bytes.length; i++) {
+            buffer[i] = bytes.charCodeAt(i);
+        }
+        var scale = Math.pow(10, dataset.precision[name]);
+        source[name] = Array.prototype.map.call(new Float32Array(buffer.buffer), function (v) {
+            // round off the float32 noise, '-' is the missing value of echarts
+            return isNaN(v) ? '-' : Math.round(v * scale) / scale;
+        });
+    });
+    option.dataset = {source: source};
+    return option;
+}
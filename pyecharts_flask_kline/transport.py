@@ -0,0 +1,74 @@
+# encoding: UTF-8
+
+import base64
+
+import numpy as np
+import pandas as pd
+import simplejson as json
+from pyecharts.charts.base import default
+
+# the transport formats of the chart data besides the pyecharts options
+TRANSPORT_DATASET = 'dataset'
+TRANSPORT_F32 = 'f32'
+TRANSPORTS = (TRANSPORT_DATASET, TRANSPORT_F32)
+
+# the decimals of the dataset columns if not configured
+DEFAULT_PRECISION = 4
+
+
+#----------------------------------------------------------------------
+def strip_chart_data(chart):
+    """drop the x axis and series data of the pyecharts chart, the chart is
+    not usable for anything else afterwards"""
+    for axis in chart.options.get('xAxis', []):
+        axis_opts = axis if isinstance(axis, dict) else axis.opts
+        axis_opts['data'] = None
+    for series in chart.options.get('series', []):
+        series['data'] = None
+
+
+#----------------------------------------------------------------------
+def round_columns(series: pd.DataFrame, precision: dict, default: int):
+    """the float columns rounded to the precision of each column"""
+    return {name: np.round(series[name].to_numpy(dtype = float),
+                           precision.get(name, default))
+            for name in series.columns}
+
+
+#----------------------------------------------------------------------
+def encode_f32(values: np.ndarray):
+    """base64 of the little endian float32 array, nan for the missing"""
+    return base64.b64encode(values.astype('<f4').tobytes()).decode('ascii')
+
+
+#----------------------------------------------------------------------
+def dump_dataset(chart, series: pd.DataFrame, transport: str = TRANSPORT_DATASET,
+                 precision: dict = None, default_precision: int = DEFAULT_PRECISION):
+    """dump the chart with all the series in one shared echarts dataset.
+
+    dataset: the columns are json arrays rounded to the precision
+    f32: the columns are base64 float32 arrays, decoded by the templates
+    (chart_transport.js) into the dataset source before setOption"""
+    names = [item['name'] for item in chart.options.get('series', [])]
+    strip_chart_data(chart)
+    option = json.loads(chart.dump_options_with_quotes())
+    for item in option.get('series', []):
+        if item['name'] in series.columns:
+            item['encode'] = {'x': 'date', 'y': item['name']}
+    series = series[[name for name in names if name in series.columns]]
+    precision = {name: (precision or {}).get(name, default_precision)
+                 for name in series.columns}
+    columns = round_columns(series, precision, default_precision)
+    dates = series.index.tolist()
+    if transport == TRANSPORT_F32:
+        option['dataset'] = {
+            'encoding': TRANSPORT_F32,
+            'date': dates,
+            'precision': precision,
+            'columns': {name: encode_f32(values) for name, values in columns.items()}}
+    else:
+        source = {'date': dates}
+        source.update((name, values.tolist()) for name, values in columns.items())
+        option['dataset'] = {'source': source}
+    return json.dumps(option, default = default, ignore_nan = True,
+                      separators = (',', ':'))
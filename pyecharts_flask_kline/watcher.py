@@ -0,0 +1,76 @@
+# encoding: UTF-8
+
+import os
+import logging
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+#----------------------------------------------------------------------
+def get_fingerprint(path: str, exclude = ()):
+    """(files, total size, last mtime ns) of the files under path, the
+    directories in exclude are skipped"""
+    exclude = {os.path.abspath(item) for item in exclude if item}
+    files, size, mtime = 0, 0, 0
+    for root, dirs, names in os.walk(path):
+        dirs[:] = [name for name in dirs
+                   if os.path.abspath(os.path.join(root, name)) not in exclude]
+        for name in names:
+            try:
+                stat = os.stat(os.path.join(root, name))
+            except OSError:
+                # removed while walking
+                continue
+            files += 1
+            size += stat.st_size
+            mtime = max(mtime, stat.st_mtime_ns)
+    return files, size, mtime
+
+
+#----------------------------------------------------------------------
+class DataWatcher(threading.Thread):
+    """poll the data paths and call on_change(name, version) once the files
+    of a path changed and then stayed the same for one interval, so the
+    collector has finished writing"""
+
+    #----------------------------------------------------------------------
+    def __init__(self, paths: dict, on_change, interval: float = 5, exclude = (),
+                 fingerprints: dict = None):
+        """paths is {name: path}, version is the last mtime (ns) of the files,
+        the changes are from fingerprints if given, else from the start"""
+        super().__init__(name = 'data-watcher', daemon = True)
+        self.paths = paths
+        self.on_change = on_change
+        self.interval = interval
+        self.exclude = exclude
+        self.fingerprints = fingerprints
+        self._stopped = threading.Event()
+
+    #----------------------------------------------------------------------
+    def run(self):
+        current = dict(self.fingerprints or {})
+        for name, path in self.paths.items():
+            if name not in current:
+                current[name] = get_fingerprint(path, self.exclude)
+        pending = {}
+        while not self._stopped.wait(self.interval):
+            for name, path in self.paths.items():
+                try:
+                    fingerprint = get_fingerprint(path, self.exclude)
+                    if fingerprint == current[name]:
+                        pending.pop(name, None)
+                    elif pending.get(name) != fingerprint:
+                        # still writing, wait for one more interval
+                        pending[name] = fingerprint
+                    else:
+                        current[name] = pending.pop(name)
+                        logger.info('data of %s changed.', name)
+                        self.on_change(name, fingerprint[2])
+                except Exception:
+                    logger.exception('watch %s failed.', name)
+
+    #----------------------------------------------------------------------
+    def stop(self):
+        self._stopped.set()
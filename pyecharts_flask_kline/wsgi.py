@@ -0,0 +1,13 @@
+# encoding: UTF-8
+
+# the entry point of the wsgi servers, e.g.
+#   gunicorn -c ./pyecharts_flask_kline/gunicorn_conf.py wsgi:app
+# with preload_app the handlers are imported and the snapshots are built
+# here in the master, before the workers are forked, and shared by them
+# copy-on-write, so are the precompressed assets
+
+from server import app, warm_data
+import assets
+
+warm_data()
+assets.load()
@@ -2,29 +2,57 @@
 
 SERVICE_NAME=flask_monitor
 PID=$SERVICE_NAME.pid
+# seconds to wait for the graceful stop
+STOP_TIMEOUT=40
 
 case "$1" in
     start)
         if [ -f ./$PID ]; then
             echo "$SERVICE_NAME is started, please use the restart option. "
+        else
+            nohup gunicorn -c ./pyecharts_flask_kline/gunicorn_conf.py --pid ./$PID wsgi:app > flask.out 2>&1 &
+            echo "==== start $SERVICE_NAME ===="
+        fi
+        ;;
+    dev)
+        # the single process flask development server
+        if [ -f ./$PID ]; then
+            echo "$SERVICE_NAME is started, please stop it first. "
         else
             nohup python3 ./pyecharts_flask_kline/server.py > flask.out 2>&1 &
             echo $! > ./$PID
-            echo "==== start $SERVICE_NAME ===="
+            echo "==== start $SERVICE_NAME (dev) ===="
         fi
         ;;
     stop)
-        kill -9 `cat ./$PID`
-        rm -rf ./$PID
+        if [ -f ./$PID ]; then
+            MASTER=`cat ./$PID`
+            # graceful, the requests in flight are finished
+            kill -TERM $MASTER
+            for i in `seq $STOP_TIMEOUT`; do
+                kill -0 $MASTER 2> /dev/null || break
+                sleep 1
+            done
+            kill -0 $MASTER 2> /dev/null && kill -9 $MASTER
+            rm -rf ./$PID
+        fi
         echo "==== stop $SERVICE_NAME ===="
         ;;
+    reload)
+        # warm the new data in the master and replace the workers gracefully
+        kill -HUP `cat ./$PID`
+        echo "==== reload $SERVICE_NAME ===="
+        ;;
     restart)
         $0 stop
-        sleep 2
         $0 start
         ;;
+    build)
+        # prebuild the charts of the date, the last trade date if not given
+        python3 ./pyecharts_flask_kline/static_snapshot.py ${2:+--date $2}
+        ;;
     *)
-        echo "Usage: bash start_flask.sh [start|stop|restart]"
+        echo "Usage: bash start_flask.sh [start|stop|restart|reload|dev|build [date]]"
         ;;
 esac
 exit 0
@@ -0,0 +1,8 @@
+# encoding: UTF-8
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the benchmarks and the flat modules of the server
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'pyecharts_flask_kline')]
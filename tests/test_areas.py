@@ -0,0 +1,81 @@
+# encoding: UTF-8
+
+"""the vectorized warning areas are the same as the loop they replaced"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks import synthetic
+synthetic.install(days = 300, products = 3)
+
+import cboe_handlers
+from cboe_handlers import hysteresis_runs
+
+CASES = 3000
+
+
+#----------------------------------------------------------------------
+def reference_warning_areas(df: pd.DataFrame, column: str, enter: float, exit: float):
+    """the loop of get_warning_areas before hysteresis_runs, with the
+    thresholds of the index, the reversed ones warn from above"""
+    warning = False
+    areas = []
+    start = None
+    for date, diff in zip(df.index, df[column]):
+        if enter > exit:
+            entered, exited = diff > enter, diff <= exit
+        else:
+            entered, exited = diff < enter, diff >= exit
+        if warning is False and entered:
+            warning = True
+            start = date
+        elif warning is True and exited:
+            warning = False
+            areas.append((start, date))
+            start = None
+    # close the last area
+    if start is not None:
+        last_date = df.index[-1]
+        if start == last_date:
+            # move the last date to the previous
+            start = df.index[-2]
+        areas.append((start, last_date))
+    return areas
+
+
+#----------------------------------------------------------------------
+def make_frame(rng, column: str):
+    """a random walk around the thresholds, with nan, on the grid of the
+    thresholds for half of the cases"""
+    n = int(rng.integers(2, 80))
+    values = np.cumsum(rng.normal(scale = 0.01, size = n)) + rng.normal(scale = 0.01)
+    if rng.random() < 0.5:
+        values = np.round(values / 0.005) * 0.005
+    values[rng.random(n) < rng.choice([0, 0.1, 0.5])] = np.nan
+    index = pd.date_range('2020-01-01', periods = n).strftime('%Y%m%d')
+    return pd.DataFrame({column: values}, index = index)
+
+
+#----------------------------------------------------------------------
+@pytest.mark.parametrize('name, enter, exit', [('vix', -0.005, 0.02),
+                                               ('gvz', 0.01, -0.01),
+                                               ('ovx', 0., 0.)])
+def test_areas_same_as_loop(monkeypatch, name, enter, exit):
+    monkeypatch.setitem(cboe_handlers.WARNING_THRESHOLDS, name, (enter, exit))
+    column = cboe_handlers.WARNING_COLUMNS[name]
+    rng = np.random.default_rng(sum(map(ord, name)))
+    open_last = 0
+    for case in range(CASES):
+        df = make_frame(rng, column)
+        expected = reference_warning_areas(df, column, enter, exit)
+        assert cboe_handlers.get_warning_areas(df, name) == expected, df
+        open_last += bool(expected) and expected[-1][1] == df.index[-1]
+    # the open ended last areas are covered
+    assert open_last > 0
+
+
+#----------------------------------------------------------------------
+def test_runs_all_nan():
+    starts, ends = hysteresis_runs(np.full(10, np.nan), -0.005, 0.02)
+    assert len(starts) == len(ends) == 0
@@ -0,0 +1,66 @@
+# encoding: UTF-8
+
+"""the libraries are vendored at their pinned digests, loaded from the cdn
+with a warning if missing"""
+
+import os
+import hashlib
+import logging
+
+import pytest
+
+import assets
+
+
+#----------------------------------------------------------------------
+@pytest.fixture
+def assets_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(assets, 'ASSETS_PATH', str(tmp_path))
+    monkeypatch.setattr(assets, '_urls', None)
+    monkeypatch.setattr(assets, '_bodies', None)
+    return tmp_path
+
+
+#----------------------------------------------------------------------
+def test_fallback_warns(assets_path, caplog):
+    (assets_path / 'jquery.min.js').write_text('var jQuery;')
+    with caplog.at_level(logging.WARNING, logger = 'assets'):
+        assert assets.url('jquery.min.js').startswith('/assets/jquery.min.')
+        assert assets.url('echarts.min.js') == assets.VENDORED['echarts.min.js'][0]
+        assets.url('echarts.min.js')
+    warnings = [record.getMessage() for record in caplog.records]
+    assert len(warnings) == 1
+    assert warnings[0].startswith('echarts.min.js is not vendored')
+
+
+#----------------------------------------------------------------------
+def test_vendored_no_warning(assets_path, caplog):
+    for name in assets.VENDORED:
+        (assets_path / name).write_text('//')
+    with caplog.at_level(logging.WARNING, logger = 'assets'):
+        assert all(assets.url(name).startswith('/assets/') for name in assets.VENDORED)
+    assert caplog.records == []
+
+
+#----------------------------------------------------------------------
+@pytest.mark.parametrize('name', sorted(assets.VENDORED))
+def test_vendored_digest(name):
+    with open(os.path.join(assets.ASSETS_PATH, name), 'rb') as asset_file:
+        assert hashlib.sha256(asset_file.read()).hexdigest() == assets.VENDORED[name][1]
+
+
+#----------------------------------------------------------------------
+def test_fetch_checks_digest(assets_path, monkeypatch):
+    class Remote(object):
+        def __init__(self, url, timeout):
+            pass
+        def __enter__(self):
+            return self
+        def __exit__(self, *args):
+            pass
+        def read(self):
+            return b'changed'
+    monkeypatch.setattr(assets.urllib.request, 'urlopen', Remote)
+    with pytest.raises(ValueError):
+        assets.fetch(['echarts.min.js'])
+    assert not os.path.exists(assets_path / 'echarts.min.js')
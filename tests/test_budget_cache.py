@@ -0,0 +1,59 @@
+# encoding: UTF-8
+
+"""the live value of a snapshot is never evicted nor expired"""
+
+import time
+
+from budget_cache import BudgetCache, MISSING
+from refresher import DataSnapshot
+
+
+#----------------------------------------------------------------------
+def test_pinned_not_evicted():
+    cache = BudgetCache('test', 100)
+    cache.pin('live')
+    cache.put('live', b'x' * 60)
+    cache.put('old', b'x' * 30)
+    cache.put('new', b'x' * 30)
+    assert cache.get('live') is not MISSING
+    assert cache.get('old') is MISSING
+    assert cache.get('new') is not MISSING
+    cache.unpin('live')
+    cache.put('newer', b'x' * 30)
+    assert cache.get('live') is MISSING
+
+
+#----------------------------------------------------------------------
+def test_pinned_not_expired():
+    cache = BudgetCache('test', 100, ttl = 0.01)
+    cache.pin('live')
+    cache.put('live', 1)
+    cache.put('old', 2)
+    time.sleep(0.05)
+    assert cache.get('live') == 1
+    assert cache.get('old') is MISSING
+    cache.invalidate()
+    assert cache.stats()['pinned'] == 0
+
+
+#----------------------------------------------------------------------
+def test_snapshot_keeps_current_key():
+    cache = BudgetCache('test', 100, ttl = 0.05)
+    dates = ['20201230']
+    builds = []
+    def build(key):
+        builds.append(key)
+        return b'x' * 60
+    snapshot = DataSnapshot('siv', build, lambda: dates[-1], cache = cache)
+    snapshot.get()
+    # another snapshot sharing the budget, and the ttl passed
+    cache.put(('vix', '20201230'), b'x' * 60)
+    time.sleep(0.1)
+    assert snapshot.get() is not None
+    assert builds == ['20201230']
+    # the new date replaces the pin of the previous one
+    dates.append('20201231')
+    snapshot.refresh().result()
+    assert cache.get(('siv', '20201230')) is MISSING
+    assert builds == ['20201230', '20201231']
+    assert cache.stats()['pinned'] == 1
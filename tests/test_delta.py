@@ -0,0 +1,55 @@
+# encoding: UTF-8
+
+"""a chart merged with the delta is the chart of the new data"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('talib')
+
+from benchmarks import synthetic
+synthetic.install(days = 300, products = 3)
+
+import options_handlers
+import cboe_handlers
+
+
+#----------------------------------------------------------------------
+def merge_rows(series: pd.DataFrame, delta: dict):
+    """the rows of the chart before the delta and the rows of the delta,
+    as chart_delta.js appendDelta"""
+    kept = series[series.index < delta['xaxis'][0]]
+    rows = pd.DataFrame(delta['series'], index = delta['xaxis'], columns = series.columns)
+    return pd.concat([kept, rows.astype(float)])
+
+
+#----------------------------------------------------------------------
+def test_siv_delta_corrects_the_last_row():
+    now_date_str = options_handlers.get_now_date_str()
+    options_handlers.get_siv_info(now_date_str)
+    index = options_handlers.get_iv_view('au', now_date_str).data.index
+    for since, date_str in zip(index[-30:-1], index[-29:]):
+        old = options_handlers.get_iv_view('au', since)
+        new = options_handlers.get_iv_view('au', date_str)
+        delta = json.loads(options_handlers.get_delta('au', since, date_str))
+        assert delta['xaxis'] == [since, date_str]
+        merged = merge_rows(options_handlers.get_series_frame(old.data, old.derived), delta)
+        expected = options_handlers.get_series_frame(new.data, new.derived)
+        np.testing.assert_allclose(merged.to_numpy(float), expected.to_numpy(float))
+
+
+#----------------------------------------------------------------------
+def test_vix_delta_replaces_the_open_areas():
+    info = cboe_handlers.get_vix_info(cboe_handlers.get_last_day())
+    df = info.df
+    for end in range(len(df) - 60, len(df)):
+        since = df.index[end - 1]
+        # the areas of the chart loaded when since was the last date
+        areas = cboe_handlers.get_warning_areas(df.iloc[:end])
+        delta = json.loads(cboe_handlers.get_delta(since))
+        merged = [tuple(area) for area in areas if area[1] < delta['xaxis'][0]] + \
+            [tuple(area) for area in delta['markareas']]
+        assert merged == [tuple(area) for area in info.warning_areas]
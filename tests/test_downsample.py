@@ -0,0 +1,60 @@
+# encoding: UTF-8
+
+"""?points=N is the budget of the rows returned, the kept rows included"""
+
+import numpy as np
+import pytest
+
+from downsample import lttb, sample_positions
+
+
+#----------------------------------------------------------------------
+def make_columns(n: int, count: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    return [np.cumsum(rng.normal(size = n)) for i in range(count)]
+
+
+#----------------------------------------------------------------------
+@pytest.mark.parametrize('points', [3, 10, 50, 100, 599])
+def test_lttb_points(points):
+    kept = lttb(make_columns(600, 1)[0], points)
+    assert len(kept) == points
+    assert kept[0] == 0 and kept[-1] == 599
+    assert (np.diff(kept) > 0).all()
+
+
+#----------------------------------------------------------------------
+@pytest.mark.parametrize('count', [1, 2, 3])
+@pytest.mark.parametrize('points', [5, 20, 50, 100, 300])
+@pytest.mark.parametrize('kept', [0, 10, 40])
+def test_sample_positions_budget(count, points, kept):
+    columns = make_columns(600, count)
+    keep = np.random.default_rng(1).choice(600, kept, replace = False)
+    positions = sample_positions(columns, points, keep = keep)
+    assert len(positions) <= max(points, kept + 2)
+    assert set(keep) <= set(positions)
+    assert positions[0] == 0 and positions[-1] == 599
+    assert (np.diff(positions) > 0).all()
+
+
+#----------------------------------------------------------------------
+def test_sample_positions_overshoot():
+    """more kept rows than points, only the kept rows and the bounds"""
+    keep = np.arange(100, 200)
+    positions = sample_positions(make_columns(600, 2), 50, keep = keep)
+    assert list(positions) == [0] + list(keep) + [599]
+
+
+#----------------------------------------------------------------------
+def test_sample_view_points():
+    pytest.importorskip('talib')
+    from benchmarks import synthetic
+    synthetic.install(days = 600, products = 3)
+    import options_handlers
+    date_str = options_handlers.get_now_date_str()
+    options_handlers.get_siv_info(date_str)
+    view = options_handlers.get_iv_view('au', date_str)
+    marks = len(np.unique(view.marks['pos']))
+    for points in (100, 200, 300):
+        sampled, extremes = options_handlers.sample_view(view, points)
+        assert marks < len(sampled.data) <= points
@@ -0,0 +1,112 @@
+# encoding: UTF-8
+
+"""the open event streams do not block the chart requests under gunicorn"""
+
+import os
+import sys
+import time
+import signal
+import socket
+import subprocess
+import urllib.request
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKERS = 1
+THREADS = 2
+
+pytest.importorskip('gunicorn')
+pytest.importorskip('talib')
+
+# the app on the synthetic data
+WSGI_CODE = '''
+from benchmarks import synthetic
+synthetic.install(300, 3)
+from wsgi import app
+'''
+
+
+#----------------------------------------------------------------------
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+#----------------------------------------------------------------------
+def get(url: str, timeout: float):
+    with urllib.request.urlopen(url, timeout = timeout) as response:
+        return response.status
+
+
+#----------------------------------------------------------------------
+def open_stream(port: int):
+    """the socket of an /events request and its status line"""
+    sock = socket.create_connection(('127.0.0.1', port), timeout = 10)
+    sock.sendall(b'GET /events HTTP/1.1\r\nHost: localhost\r\n\r\n')
+    return sock, sock.recv(4096).split(b'\r\n', 1)[0]
+
+
+#----------------------------------------------------------------------
+@pytest.fixture
+def start_server(tmp_path):
+    processes = []
+
+    def start(worker_class: str):
+        port = get_free_port()
+        os.makedirs(tmp_path / 'data')
+        (tmp_path / 'data' / 'data.ini').write_text(
+            '[data]\n'
+            f'options_monitor = {tmp_path}\n'
+            f'cboe_vix_gvz_ovx_monitor = {tmp_path}\n'
+            '[server]\n'
+            'cache_path =\n'
+            'static_path =\n'
+            f'bind = 127.0.0.1:{port}\n'
+            f'workers = {WORKERS}\n'
+            f'threads = {THREADS}\n'
+            f'worker_class = {worker_class}\n'
+            'watch_interval = 1\n')
+        (tmp_path / 'synthetic_wsgi.py').write_text(WSGI_CODE)
+        pythonpath = ','.join([str(tmp_path), ROOT, os.path.join(ROOT, 'pyecharts_flask_kline')])
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn',
+             '-c', os.path.join(ROOT, 'pyecharts_flask_kline', 'gunicorn_conf.py'),
+             '--pythonpath', pythonpath, 'synthetic_wsgi:app'],
+            cwd = tmp_path, stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+        processes.append(process)
+        deadline = time.time() + 120
+        while True:
+            try:
+                get(f'http://127.0.0.1:{port}/vix', 5)
+                return port
+            except OSError:
+                if process.poll() is not None or time.time() > deadline:
+                    raise RuntimeError(f'gunicorn with {worker_class} did not start')
+                time.sleep(0.5)
+
+    yield start
+    for process in processes:
+        # quick shutdown, the graceful one waits for the open streams
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+#----------------------------------------------------------------------
+@pytest.mark.parametrize('worker_class, status', [('gthread', b'204'), ('gevent', b'200')])
+def test_streams_do_not_block_charts(start_server, worker_class, status):
+    if worker_class == 'gevent':
+        pytest.importorskip('gevent')
+    port = start_server(worker_class)
+    streams = [open_stream(port) for i in range(WORKERS * THREADS + 4)]
+    try:
+        assert all(status in line for sock, line in streams)
+        assert get(f'http://127.0.0.1:{port}/siv/au/20201231', 10) == 200
+        assert get(f'http://127.0.0.1:{port}/vix/data', 10) == 200
+    finally:
+        for sock, line in streams:
+            sock.close()
@@ -0,0 +1,60 @@
+# encoding: UTF-8
+
+"""the frozen frames raise on the changes and give plain frames to write"""
+
+import pandas as pd
+import pytest
+
+from frozen import freeze_frame
+
+INDEXES = [pd.Index(['20200101', '20200102', '20200103']),
+           pd.date_range('2020-01-01', periods = 3)]
+
+# the changes of the frame in place, each raises
+MUTATIONS = {
+    'setitem': lambda df: df.__setitem__('b', 1),
+    'insert': lambda df: df.insert(0, 'b', 1),
+    'delitem': lambda df: df.__delitem__('a'),
+    'pop': lambda df: df.pop('a'),
+    'loc new column': lambda df: df.loc.__setitem__((slice(None), 'b'), 1),
+    'iloc value': lambda df: df.iloc.__setitem__((0, 0), 9.),
+    'set index': lambda df: setattr(df, 'index', [1, 2, 3]),
+    'set columns': lambda df: setattr(df, 'columns', ['x', 'y']),
+    'rename inplace': lambda df: df.rename(columns = {'a': 'c'}, inplace = True),
+    'sort inplace': lambda df: df.sort_values('a', ascending = False, inplace = True),
+    'fillna inplace': lambda df: df.fillna(0, inplace = True),
+    'drop inplace': lambda df: df.drop(columns = 'a', inplace = True),
+    'set_index inplace': lambda df: df.set_index('s', inplace = True),
+    'reset_index inplace': lambda df: df.reset_index(inplace = True),
+    'index values': lambda df: df.index.values.__setitem__(0, df.index.values[1]),
+}
+
+
+#----------------------------------------------------------------------
+def make_frame(index):
+    return freeze_frame(pd.DataFrame({'a': [1., 2., 3.], 's': ['x', 'y', 'z']},
+                                     index = index))
+
+
+#----------------------------------------------------------------------
+@pytest.mark.parametrize('index', INDEXES, ids = ['str', 'datetime'])
+@pytest.mark.parametrize('name', list(MUTATIONS))
+def test_mutation_raises(index, name):
+    df = make_frame(index)
+    expected = pd.DataFrame(df, copy = True)
+    with pytest.raises((TypeError, ValueError)):
+        MUTATIONS[name](df)
+    pd.testing.assert_frame_equal(pd.DataFrame(df), expected)
+
+
+#----------------------------------------------------------------------
+@pytest.mark.parametrize('index', INDEXES, ids = ['str', 'datetime'])
+def test_new_frames_are_plain(index):
+    df = make_frame(index)
+    copied = df.copy()
+    copied['b'] = 1
+    copied.iloc[0, 0] = 9.
+    assert type(copied) is pd.DataFrame
+    assert type(df.assign(b = 1)) is pd.DataFrame
+    assert type(df.iloc[:2]) is pd.DataFrame
+    assert list(df.columns) == ['a', 's'] and df['a'].tolist() == [1., 2., 3.]
@@ -0,0 +1,83 @@
+# encoding: UTF-8
+
+"""under gevent a slow rebuild runs in a real thread, the chart requests are
+answered from the previous snapshot meanwhile"""
+
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUILD_SECONDS = 2
+
+pytest.importorskip('gevent')
+pytest.importorskip('talib')
+
+# run patched in a process of its own, pytest is not
+SCRIPT = '''
+from gevent import monkey
+monkey.patch_all()
+import sys, json, time, gevent
+from benchmarks import synthetic
+synthetic.install(300, 3)
+import server
+server.warm_data()
+import options_handlers
+snapshot = options_handlers.siv_snapshot
+old_key = snapshot.key
+build = snapshot._build
+
+def slow_build(key):
+    # cpu bound, as SIVManager.prepare
+    deadline = time.perf_counter() + %(seconds)s
+    while time.perf_counter() < deadline:
+        pass
+    return build(old_key)
+
+ticks = []
+def tick():
+    while True:
+        ticks.append(time.perf_counter())
+        gevent.sleep(0.01)
+
+snapshot._build = slow_build
+snapshot._current_key = lambda: 'new'
+ticker = gevent.spawn(tick)
+start = time.perf_counter()
+response = server.app.test_client().get('/siv/au/20201231')
+answered = time.perf_counter() - start
+snapshot.refresh('new').result()
+built = time.perf_counter() - start
+ticker.kill()
+gaps = [y - x for x, y in zip(ticks, ticks[1:])]
+print(json.dumps({'status': response.status_code, 'answered': answered,
+                  'built': built, 'max_gap': max(gaps)}))
+'''
+
+
+#----------------------------------------------------------------------
+def test_requests_served_during_rebuild(tmp_path):
+    os.makedirs(tmp_path / 'data')
+    (tmp_path / 'data' / 'data.ini').write_text(
+        '[data]\n'
+        f'options_monitor = {tmp_path}\n'
+        f'cboe_vix_gvz_ovx_monitor = {tmp_path}\n'
+        '[server]\n'
+        f'cache_path = {tmp_path / "cache"}\n'
+        'static_path =\n'
+        'watch_interval = 0\n')
+    env = dict(os.environ, PYTHONPATH = os.pathsep.join(
+        [ROOT, os.path.join(ROOT, 'pyecharts_flask_kline'), os.environ.get('PYTHONPATH', '')]))
+    output = subprocess.run([sys.executable, '-c', SCRIPT % {'seconds': BUILD_SECONDS}],
+                            cwd = tmp_path, env = env, capture_output = True,
+                            text = True, timeout = 120, check = True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    assert result['status'] == 200
+    # the previous snapshot, not after the build
+    assert result['answered'] < BUILD_SECONDS / 2
+    assert result['built'] >= BUILD_SECONDS
+    # the other greenlets kept running
+    assert result['max_gap'] < BUILD_SECONDS / 2
@@ -0,0 +1,83 @@
+# encoding: UTF-8
+
+"""the vectorized mark points are the same as the iterrows loop they replaced"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('talib')
+
+from benchmarks import synthetic
+synthetic.install(days = 300, products = 3)
+
+from pyecharts import options as opts
+from pyecharts.globals import SymbolType
+
+import options_handlers
+from options_handlers import CLOSE_PRICE_NAME, STATE_NAME, VOL_STATE_NAME, \
+    STATE_IN_GAME_UP, STATE_IN_GAME_DOWN, STATE_KEEP_WATCHING_UP, STATE_KEEP_WATCHING_DOWN
+
+
+#----------------------------------------------------------------------
+def reference_mark_points(data: pd.DataFrame):
+    """the loop of kline_chart before the mark table"""
+    marks = []
+    for idx, row in data.iterrows():
+        ssize = 10
+        if row[VOL_STATE_NAME] == True:
+            mi_vol = opts.MarkPointItem(
+                coord = [idx, row[CLOSE_PRICE_NAME]],
+                symbol = SymbolType.DIAMOND,
+                symbol_size = 15,
+                itemstyle_opts = opts.ItemStyleOpts(color = 'gold'))
+            marks.append(mi_vol)
+        if row[STATE_NAME] == STATE_IN_GAME_UP:
+            st = SymbolType.ARROW
+            style = opts.ItemStyleOpts(color = 'fuchsia')
+            ssize = 15
+        elif row[STATE_NAME] == STATE_IN_GAME_DOWN:
+            st = SymbolType.ROUND_RECT
+            style = opts.ItemStyleOpts(color = 'cyan')
+            ssize = 15
+        elif row[STATE_NAME] == STATE_KEEP_WATCHING_UP:
+            st = SymbolType.DIAMOND
+            style = opts.ItemStyleOpts(color = 'fuchsia')
+        elif row[STATE_NAME] == STATE_KEEP_WATCHING_DOWN:
+            st = SymbolType.DIAMOND
+            style = opts.ItemStyleOpts(color = 'cyan')
+        else:
+            continue
+        mi = opts.MarkPointItem(coord = [idx, row[CLOSE_PRICE_NAME]],
+                                symbol = st,
+                                symbol_size = ssize,
+                                itemstyle_opts = style)
+        marks.append(mi)
+    return marks
+
+
+#----------------------------------------------------------------------
+def make_frame(seed: int, index: str):
+    df = synthetic.siv_frame('AU', 300, seed)
+    if index == 'datetime':
+        df.index = pd.to_datetime(df.index)
+    elif index == 'object_vol_state':
+        # the volume state as read from csv, with the missing values
+        vol_state = df[VOL_STATE_NAME].astype(object)
+        vol_state[::17] = np.nan
+        df[VOL_STATE_NAME] = vol_state
+    return df
+
+
+#----------------------------------------------------------------------
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('index', ['str', 'datetime', 'object_vol_state'])
+def test_marks_same_as_iterrows(monkeypatch, seed, index):
+    data = make_frame(seed, index)
+    assert len(reference_mark_points(data)) > 0
+    derived = options_handlers.get_derived_frame(data)
+    vectorized = options_handlers.kline_chart(data, 'au', derived = derived).dump_options_with_quotes()
+    monkeypatch.setattr(options_handlers, 'get_mark_points',
+                        lambda table: reference_mark_points(data))
+    reference = options_handlers.kline_chart(data, 'au', derived = derived).dump_options_with_quotes()
+    assert vectorized == reference
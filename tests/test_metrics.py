@@ -0,0 +1,84 @@
+# encoding: UTF-8
+
+"""the metrics of the gunicorn workers are merged on scrape"""
+
+import os
+import json
+
+import pytest
+
+import metrics
+from budget_cache import BudgetCache
+
+
+#----------------------------------------------------------------------
+def make_state(requests: int, entries: int):
+    """the values of a worker with requests of 0.002 seconds"""
+    histogram = metrics.Histogram('seconds', '', 'endpoint', metrics.SECONDS_BUCKETS)
+    for i in range(requests):
+        histogram.observe('vix', 0.002)
+    cache = BudgetCache('frames', 100)
+    for i in range(entries):
+        cache.put(i, b'x')
+    cache.get(0)
+    return {'histograms': {histogram.name: histogram.get_values()},
+            'caches': {cache.name: cache.stats()}}
+
+
+#----------------------------------------------------------------------
+@pytest.fixture
+def metrics_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_DIR', None)
+    # written by the last run
+    for name in ('101.json', metrics.DEAD_FILE, '.102.json.100', '.dead.json.100'):
+        (tmp_path / name).write_text('{}')
+    # not the metrics
+    for name in ('stale.json', 'notes.txt', '.hidden'):
+        (tmp_path / name).write_text('')
+    os.makedirs(tmp_path / 'sub' / '103.json')
+    metrics.set_metrics_dir(str(tmp_path), clear = True)
+    return tmp_path
+
+
+#----------------------------------------------------------------------
+def test_clear_own_files_only(metrics_dir):
+    assert sorted(os.listdir(metrics_dir)) == ['.hidden', 'notes.txt', 'stale.json', 'sub']
+
+
+#----------------------------------------------------------------------
+def test_merge_workers(metrics_dir):
+    metrics.write_json(str(metrics_dir / '101.json'), make_state(3, 2))
+    metrics.write_json(str(metrics_dir / '102.json'), make_state(4, 5))
+    state = metrics.load_state()
+    counts, total = state['histograms']['seconds']['vix']
+    assert sum(counts) == 7
+    assert total == pytest.approx(0.014)
+    assert state['caches']['frames']['entries'] == 7
+    assert state['caches']['frames']['hits'] == 2
+
+
+#----------------------------------------------------------------------
+def test_retire_keeps_counters(metrics_dir):
+    metrics.write_json(str(metrics_dir / '101.json'), make_state(3, 2))
+    metrics.write_json(str(metrics_dir / '102.json'), make_state(4, 5))
+    metrics.retire(101)
+    metrics.write_json(str(metrics_dir / '103.json'), make_state(1, 1))
+    metrics.retire(103)
+    assert sorted(name for name in os.listdir(metrics_dir) if metrics.is_metrics_file(name)) == \
+        ['102.json', metrics.DEAD_FILE]
+    state = metrics.load_state()
+    assert sum(state['histograms']['seconds']['vix'][0]) == 8
+    assert state['caches']['frames']['hits'] == 3
+    # the gauges of the live worker only
+    assert state['caches']['frames']['entries'] == 5
+    with open(metrics_dir / metrics.DEAD_FILE) as dead_file:
+        assert json.load(dead_file)['caches']['frames']['entries'] == 0
+
+
+#----------------------------------------------------------------------
+def test_render_includes_this_worker(metrics_dir):
+    metrics.write_json(str(metrics_dir / '1.json'), make_state(3, 2))
+    metrics.REQUEST_SECONDS.observe('test_render', 0.002)
+    text = metrics.render()
+    assert f'{os.getpid()}.json' in os.listdir(metrics_dir)
+    assert 'vix_web_viewer_request_seconds_count{endpoint="test_render"} 1' in text
@@ -0,0 +1,27 @@
+# encoding: UTF-8
+
+"""the view as of a past date knows nothing after that date"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip('talib')
+
+from benchmarks import synthetic
+synthetic.install(days = 300, products = 3)
+
+import options_handlers
+
+
+#----------------------------------------------------------------------
+@pytest.mark.parametrize('product', ['au', 'ag', 'cu'])
+def test_view_derived_as_of(product):
+    now_date_str = options_handlers.get_now_date_str()
+    options_handlers.get_siv_info(now_date_str)
+    index = options_handlers.get_iv_view(product, now_date_str).data.index
+    for as_of in list(index[-60:]) + [index[0]]:
+        view = options_handlers.get_iv_view(product, as_of)
+        assert view.data.index[-1] == as_of
+        # as derived from the rows up to as_of only
+        expected = options_handlers.get_derived_frame(view.data)
+        np.testing.assert_array_equal(view.derived.to_numpy(float), expected.to_numpy(float))